@@ -1,7 +1,29 @@
+import argparse
+import columnar
+import constants
 import die_or_dare
 import inspect
+import json
 import jsonpickle
+import multiprocessing
 import os
+import shutil
+
+COLUMN_NAMES = ('winner_class', 'loser_class', 'winner_alias', 'game_result',
+                'duel_index', 'winner_joker_value_strategy',
+                'loser_joker_value_strategy', 'winner_joker_position_strategy',
+                'loser_joker_position_strategy', 'file_name')
+STORE_SCHEMA = (('winner_class', 'category'), ('loser_class', 'category'),
+                ('winner_alias', 'category'), ('game_result', 'int8'),
+                ('duel_index', 'int8'),
+                ('winner_joker_value_strategy', 'category'),
+                ('loser_joker_value_strategy', 'category'),
+                ('winner_joker_position_strategy', 'category'),
+                ('loser_joker_position_strategy', 'category'),
+                ('file_name', 'str'))
+STORE_DIRECTORY_NAME = 'analysis'
+EXTENSIONS = ('.json', die_or_dare.StateLog.EXTENSION,
+              die_or_dare.ReplayLog.EXTENSION)
 
 
 def stringify(argument):
@@ -17,48 +39,147 @@ def stringify(argument):
         raise Exception('This is not accepted')
 
 
-def main():
-    current_file_path = os.path.abspath(__file__)
-    current_directory_path = os.path.dirname(current_file_path)
-    directory_name = 'json'
-    input_directory_path = os.path.join(current_directory_path, directory_name)
+def row_from_json(file_path):
+    with open(file_path) as file:
+        states = json.load(file)
+    game = jsonpickle.decode(states[-1])  # only the final state is decoded
+    winner = game.winner
+    loser = game.loser
+    winner_class = winner.__class__
+    loser_class = loser.__class__
+    winner_alias = winner.alias
+    game_result = game.result.name
+    duel_index = game.duel_index
+    winner_joker_value_strategy = winner.joker_value_strategy
+    loser_joker_value_strategy = loser.joker_value_strategy
+    winner_joker_position_strategy = winner.joker_position_strategy
+    loser_joker_position_strategy = loser.joker_position_strategy
+    return (winner_class, loser_class, winner_alias, game_result, duel_index,
+            winner_joker_value_strategy, loser_joker_value_strategy,
+            winner_joker_position_strategy, loser_joker_position_strategy)
+
+
+def row_from_state_log(file_path):
+    metadata, state = die_or_dare.StateLog.read_final_state(file_path)
+    return row_from_final_state(metadata, state)
+
+
+def row_from_final_state(metadata, state):
+    summary = state.summary
+    red_won = summary[state.WINNER] == 0
+    winner = metadata['red'] if red_won else metadata['black']
+    loser = metadata['black'] if red_won else metadata['red']
+    game_result = constants.GameResult(int(summary[state.RESULT])).name
+    duel_index = int(summary[state.DUEL_INDEX])
+    return (winner['class'], loser['class'], winner['alias'], game_result,
+            duel_index, winner['joker_value_strategy'],
+            loser['joker_value_strategy'], winner['joker_position_strategy'],
+            loser['joker_position_strategy'])
+
+
+def row_from_replay_log(file_path):
+    metadata, state = die_or_dare.ReplayLog.read_final_state(file_path)
+    return row_from_final_state(metadata, state)
+
+
+def analyze(file_path):
+    """one row of strings for a saved game, run in a worker process"""
+    if file_path.endswith('.json'):
+        row = row_from_json(file_path)
+    elif file_path.endswith(die_or_dare.StateLog.EXTENSION):
+        row = row_from_state_log(file_path)
+    else:
+        row = row_from_replay_log(file_path)
+    row += (os.path.basename(file_path),)
+    return tuple(stringify(element) for element in row)
+
+
+def to_store_row(row):
+    """type a row from analyze for the columnar store"""
+    row = list(row)
+    game_result_index = COLUMN_NAMES.index('game_result')
+    row[game_result_index] = constants.GameResult[row[game_result_index]].value
+    duel_index_index = COLUMN_NAMES.index('duel_index')
+    row[duel_index_index] = int(row[duel_index_index])
+    return row
+
+
+def analyzed_file_names(output_file_path):
+    """file names already in an existing output file
+
+    None if there is no output file to append to, or if it was written with
+    other columns and has to be rewritten.
+    """
+    if not os.path.exists(output_file_path):
+        return None
+    with open(output_file_path) as output:
+        header = tuple(output.readline().rstrip('\n').split(','))
+        if header != COLUMN_NAMES:
+            return None
+        index = header.index('file_name')
+        return set(line.rstrip('\n').split(',')[index] for line in output)
+
+
+def main(input_directory_path=None, incremental=False, processes=None,
+         store=False):
+    if input_directory_path is None:
+        current_file_path = os.path.abspath(__file__)
+        current_directory_path = os.path.dirname(current_file_path)
+        directory_name = 'json'
+        input_directory_path = os.path.join(current_directory_path,
+                                            directory_name)
+    if store:
+        store_main(input_directory_path, incremental, processes)
+        return
     output_file_name = 'analysis.csv'
     output_file_path = os.path.join(input_directory_path, output_file_name)
-    with open(output_file_path, 'w') as output:
-        column_names = ('winner_class', 'loser_class', 'winner_alias',
-                        'game_result', 'duel_index',
-                        'winner_joker_value_strategy',
-                        'loser_joker_value_strategy',
-                        'winner_joker_position_strategy',
-                        'loser_joker_position_strategy')
-        output.write(','.join(column_names) + '\n')
-        for file_name in os.listdir(input_directory_path):
-            if file_name.endswith('.json'):
-                output_handler = die_or_dare.OutputHandler()
-                file_path = os.path.join(input_directory_path, file_name)
-                output_handler.import_from_json(file_path)
-                final_state = output_handler.states[-1]
-                game = jsonpickle.decode(final_state)
-                winner = game.winner
-                loser = game.loser
-                winner_class = winner.__class__
-                loser_class = loser.__class__
-                winner_alias = winner.alias
-                game_result = game.result.name
-                duel_index = game.duel_index
-                winner_joker_value_strategy = winner.joker_value_strategy
-                loser_joker_value_strategy = loser.joker_value_strategy
-                winner_joker_position_strategy = winner.joker_position_strategy
-                loser_joker_position_strategy = loser.joker_position_strategy
-                row = (winner_class, loser_class, winner_alias, game_result,
-                       duel_index, winner_joker_value_strategy,
-                       loser_joker_value_strategy,
-                       winner_joker_position_strategy,
-                       loser_joker_position_strategy)
-                row_str = (stringify(element) for element in row)
-                output.write(','.join(row_str) + '\n')
+    skipped = analyzed_file_names(output_file_path) if incremental else None
+    append = skipped is not None
+    file_paths = saved_game_file_paths(input_directory_path,
+                                       skipped if append else set())
+    with open(output_file_path, 'a' if append else 'w') as output:
+        if not append:
+            output.write(','.join(COLUMN_NAMES) + '\n')
+        with multiprocessing.Pool(processes) as pool:
+            for row in pool.imap_unordered(analyze, file_paths, chunksize=64):
+                output.write(','.join(row) + '\n')
     print('Done!')
 
 
+def store_main(input_directory_path, incremental=False, processes=None):
+    """like main, but into a columnar store at json/analysis/"""
+    store_directory_path = os.path.join(input_directory_path,
+                                        STORE_DIRECTORY_NAME)
+    if not incremental and os.path.exists(store_directory_path):
+        shutil.rmtree(store_directory_path)
+    store = columnar.ColumnarStore(store_directory_path, STORE_SCHEMA)
+    skipped = set(store.load(['file_name'])['file_name']) if incremental \
+        else set()
+    file_paths = saved_game_file_paths(input_directory_path, skipped)
+    with store, multiprocessing.Pool(processes) as pool:
+        for row in pool.imap_unordered(analyze, file_paths, chunksize=64):
+            store.append(to_store_row(row))
+    print('Done!')
+
+
+def saved_game_file_paths(input_directory_path, skipped=frozenset()):
+    return [os.path.join(input_directory_path, file_name) for file_name in
+            sorted(os.listdir(input_directory_path)) if
+            file_name.endswith(EXTENSIONS) and file_name not in skipped]
+
+
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(
+        description='Summarize saved games into json/analysis.csv.')
+    parser.add_argument('-d', '--directory', default=None,
+                        help='directory of saved games (default: json)')
+    parser.add_argument('-i', '--incremental', action='store_true',
+                        help='skip games already in the output')
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help='number of worker processes (default: all cores)')
+    parser.add_argument('--store', action='store_true',
+                        help='write a columnar store to json/analysis/ '
+                             'instead of a CSV file')
+    arguments = parser.parse_args()
+    main(arguments.directory, arguments.incremental, arguments.processes,
+         arguments.store)
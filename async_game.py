@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import constants
+import die_or_dare
+import random
+import time
+
+
+async def display(output_handler, game=None, message='', duration=0,
+                  suppress_output=False, humans_playing=True):
+    """render without blocking the event loop while the message sinks in"""
+    if suppress_output:
+        return
+    if output_handler.renderer is None:
+        game_state_in_json = None if game is None else game.to_json()
+        output_handler.render(game_state_in_json, message)
+    else:
+        output_handler.renderer.render(game, message)
+    await asyncio.sleep(die_or_dare.PACING.seconds(duration, humans_playing))
+
+
+async def _in_thread(function, *args):
+    """run a blocking call, like waiting for a human, off the event loop"""
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, function, *args)
+
+
+async def _shout(game, player, prev_envstate=None):
+    if isinstance(player, die_or_dare.HumanPlayer):
+        return await _in_thread(game.shout_of, player, prev_envstate)
+    return game.shout_of(player, prev_envstate)
+
+
+async def accept(game, prev_envstate=None):
+    """awaitable Game.accept
+
+    Only humans block: their deck choices and keypresses wait in a worker
+    thread, and the shouts of a human and a computer are collected at the
+    same time.
+    """
+    duel = game.duel_ongoing
+    players = game.players
+    choosing_deck = duel.offense.deck_in_duel is None or \
+        duel.defense.deck_in_duel is None
+    if choosing_deck:
+        if isinstance(duel.offense, die_or_dare.HumanPlayer):
+            return await _in_thread(game.accept, prev_envstate)
+        return game.accept(prev_envstate)
+    if all(isinstance(player, die_or_dare.HumanPlayer) for player in players):
+        return await _in_thread(game.accept, prev_envstate)
+    shouts = await asyncio.gather(*(_shout(game, player, prev_envstate) for
+                                    player in duel.players))
+    return die_or_dare.ShoutInput(list(shouts))
+
+
+async def play(player1, player2, suppress_output=False, save_all=False,
+               save_result=False, game_class=die_or_dare.Game,
+               renderer=None, rng=None):
+    """the game of die_or_dare.main as a coroutine, returning the game
+
+    renderer, a TerminalRenderer, can stream the game to its own terminal.
+    rng, a random.Random, makes the game independent of the other games.
+    """
+    output_handler = die_or_dare.OutputHandler(renderer)
+    humans_playing = any(isinstance(player, die_or_dare.HumanPlayer) for
+                         player in (player1, player2))
+
+    # red/black decision
+    message = "All right, {} and {}. Let's get started!".format(
+        player1.name, player2.name)
+    message += '\nLet\'s flip a coin to decide who will be the Player Red!'
+    await display(output_handler, None, message,
+                  constants.Duration.BEFORE_COIN_TOSS, suppress_output,
+                  humans_playing)
+
+    player_red, player_black = die_or_dare.RandomPlayerOrder(
+        player1, player2, random if rng is None else rng).players
+    message = '{}, you are the Player Red, so you will go first.'.format(
+        player_red.name)
+    message += '\n{}, you are the Player Black.'.format(player_black.name)
+    await display(output_handler, None, message,
+                  constants.Duration.AFTER_COIN_TOSS, suppress_output,
+                  humans_playing)
+
+    game = game_class(player_red, player_black,
+                      headless=suppress_output and not save_all and
+                      not save_result, rng=rng)
+    game.distribute_piles()
+    game.build_decks()
+
+    message = "Let's start DieOrDare!\nHere we go!"
+    await display(output_handler, None, message,
+                  constants.Duration.BEFORE_GAME_START, suppress_output,
+                  humans_playing)
+
+    if save_all:
+        output_handler.start_replay(game)
+    while not game.is_over():
+        duel = game.to_next_duel()
+        while not duel.is_over():
+            message, duration = game.prepare()
+            await display(output_handler, game, message, duration,
+                          suppress_output, humans_playing)
+            user_input = await accept(game)
+            message, duration = game.process(user_input)
+            if save_all:
+                output_handler.record(user_input, game)
+            await display(output_handler, game, message, duration,
+                          suppress_output, humans_playing)
+    if save_all:
+        output_handler.export_replay()
+    elif save_result:
+        output_handler.save(game, message)
+        output_handler.export_game_states(final_state_only=True)
+    return game
+
+
+async def play_all(matches, **kwargs):
+    games = [play(player1, player2, **kwargs) for player1, player2 in matches]
+    return await asyncio.gather(*games)
+
+
+def host(matches, **kwargs):
+    """play every (player1, player2) pair at once in one event loop
+
+    Keyword arguments go to play. Returns the finished games in order.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(play_all(matches, **kwargs))
+    finally:
+        loop.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Host many computer games at once in one process.')
+    parser.add_argument('-n', '--games', type=int, default=100,
+                        help='number of simultaneous games')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='do not print the games (nor wait for them)')
+    parser.add_argument('--speed', type=die_or_dare.Pacing.speed_argument,
+                        default=1.0,
+                        help='divide every wait between displays by this')
+    parser.add_argument('--fast', action='store_true',
+                        help='skip the waits, since no human is playing')
+    arguments = parser.parse_args()
+    die_or_dare.PACING.speed = arguments.speed
+    die_or_dare.PACING.skip_without_humans = arguments.fast
+    matches = []
+    for _ in range(arguments.games):
+        player1 = die_or_dare.ComputerPlayer()
+        player2 = die_or_dare.ComputerPlayer(player1.name)
+        matches.append((player1, player2))
+    start = time.time()
+    finished = host(matches, suppress_output=arguments.quiet)
+    num_red_won = sum(game.winner == game.player_red for game in finished)
+    print('Player Red won {} of {} games in {:.2f} seconds.'.format(
+        num_red_won, len(finished), time.time() - start))
+    print('Done!')
@@ -0,0 +1,134 @@
+import json
+import numpy
+import os
+
+# columns printed by ReinforcementLearningAgent.train
+TRAINING_SCHEMA = (('epoch', 'int32'), ('loss', 'float32'),
+                   ('episode', 'int32'), ('result', 'int8'),
+                   ('reason', 'int8'), ('duel', 'int8'), ('time', 'float32'),
+                   ('color', 'int8'))
+
+
+class ColumnarStore(object):
+    """append-only table kept as .npz chunks of typed columns
+
+    The schema is a sequence of (name, type) pairs where type is a NumPy
+    dtype name ('str' for free text) or 'category'. Categorical columns are
+    stored as int32 codes into a list of categories that lives in
+    schema.json next to the chunks. Rows are buffered and written out as
+    one chunk per chunk_size rows.
+    """
+    CATEGORY = 'category'
+    SCHEMA_FILE_NAME = 'schema.json'
+    CHUNK_FILE_NAME = 'chunk_{:06d}.npz'
+
+    def __init__(self, directory, schema=None, chunk_size=65536):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        schema_file_path = os.path.join(directory, self.SCHEMA_FILE_NAME)
+        if os.path.exists(schema_file_path):
+            with open(schema_file_path) as schema_file:
+                saved = json.load(schema_file)
+            self.schema = [tuple(column) for column in saved['schema']]
+            self.categories = saved['categories']
+            if schema is not None and [tuple(column) for column in
+                                       schema] != self.schema:
+                raise ValueError('The schema differs from the saved one.')
+        elif schema is None:
+            raise ValueError('A new store needs a schema.')
+        else:
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            self.schema = [tuple(column) for column in schema]
+            self.categories = {name: [] for name, type_ in self.schema if
+                               type_ == self.CATEGORY}
+        self._codes = {name: {category: code for code, category in
+                              enumerate(categories)} for name, categories in
+                       self.categories.items()}
+        self._buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    @property
+    def names(self):
+        return [name for name, _ in self.schema]
+
+    def _chunk_file_paths(self):
+        file_names = sorted(file_name for file_name in
+                            os.listdir(self.directory) if
+                            file_name.startswith('chunk_'))
+        return [os.path.join(self.directory, file_name) for file_name in
+                file_names]
+
+    def _encode(self, name, category):
+        codes = self._codes[name]
+        code = codes.get(category)
+        if code is None:
+            code = len(codes)
+            codes[category] = code
+            self.categories[name].append(category)
+        return code
+
+    def append(self, row):
+        """buffer a row given in schema order"""
+        if len(row) != len(self.schema):
+            raise ValueError('Expected {} columns.'.format(len(self.schema)))
+        self._buffer.append(tuple(row))
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def flush(self):
+        if not self._buffer:
+            return
+        columns = {}
+        for index, (name, type_) in enumerate(self.schema):
+            values = [row[index] for row in self._buffer]
+            if type_ == self.CATEGORY:
+                codes = [self._encode(name, value) for value in values]
+                columns[name] = numpy.array(codes, dtype=numpy.int32)
+            else:
+                columns[name] = numpy.array(values, dtype=type_)
+        chunk_file_name = self.CHUNK_FILE_NAME.format(
+            len(self._chunk_file_paths()))
+        chunk_file_path = os.path.join(self.directory, chunk_file_name)
+        numpy.savez(chunk_file_path, **columns)
+        schema_file_path = os.path.join(self.directory, self.SCHEMA_FILE_NAME)
+        with open(schema_file_path, 'w') as schema_file:
+            json.dump({'schema': self.schema, 'categories': self.categories},
+                      schema_file)
+        self._buffer = []
+
+    def load(self, names=None, decode=False):
+        """concatenate every chunk into one array per column
+
+        Categorical columns come back as codes unless decode is set, in which
+        case they are mapped back to their categories.
+        """
+        if names is None:
+            names = self.names
+        types = dict(self.schema)
+        parts = {name: [] for name in names}
+        for chunk_file_path in self._chunk_file_paths():
+            with numpy.load(chunk_file_path) as chunk:
+                for name in names:
+                    parts[name].append(chunk[name])
+        columns = {}
+        for name in names:
+            if parts[name]:
+                column = numpy.concatenate(parts[name])
+            else:
+                dtype = numpy.int32 if types[name] == self.CATEGORY else \
+                    types[name]
+                column = numpy.zeros(0, dtype=dtype)
+            if decode and types[name] == self.CATEGORY:
+                column = numpy.asarray(self.categories[name])[column]
+            columns[name] = column
+        return columns
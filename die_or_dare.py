@@ -4,6 +4,7 @@ import collections
 import constants
 import datetime
 import functools
+import importlib
 import itertools
 import json
 import jsonpickle
@@ -11,6 +12,9 @@ import keyboard
 import numpy
 import os
 import random
+import struct
+import sys
+import threading
 import time
 
 
@@ -63,8 +67,8 @@ class NameTextInput(NameInput):
         return cls(name)
 
     @classmethod
-    def auto_generate(cls, forbidden_name):
-        name = 'Computer' + str(random.randint(1, 999999))
+    def auto_generate(cls, forbidden_name, rng=random):
+        name = 'Computer' + str(rng.randint(1, 999999))
         if name == forbidden_name:
             name += 'a'
         return cls(name)
@@ -143,13 +147,13 @@ class KeySettingsTextInput(KeySettingsInput):
 class JokerValueStrategy(abc.ABC):
     @staticmethod
     @abc.abstractmethod
-    def apply(cards):
+    def apply(cards, rng=random):
         pass
 
 
 class Thirteen(JokerValueStrategy):
     @staticmethod
-    def apply(cards):
+    def apply(cards, rng=random):
         """Assign 13."""
         for card in cards:
             if card._is_joker():
@@ -159,7 +163,7 @@ class Thirteen(JokerValueStrategy):
 
 class SameAsMax(JokerValueStrategy):
     @staticmethod
-    def apply(cards):
+    def apply(cards, rng=random):
         """Assign the biggest value that is already in the deck."""
         if any(card._is_joker() for card in cards):
             joker = next(card for card in cards if card._is_joker())
@@ -170,18 +174,18 @@ class SameAsMax(JokerValueStrategy):
 
 class RandomNumber(JokerValueStrategy):
     @staticmethod
-    def apply(cards):
+    def apply(cards, rng=random):
         """Assign a random number."""
         for card in cards:
             if card._is_joker():
                 values = [rank.value for rank in constants.Rank]
-                card._value = random.choice(values)
+                card._value = rng.choice(values)
                 break
 
 
 class NextBiggest(JokerValueStrategy):
     @staticmethod
-    def apply(cards):
+    def apply(cards, rng=random):
         """Assign the next biggest value that is not yet in the deck."""
         if any(card._is_joker() for card in cards):
             joker = next(card for card in cards if card._is_joker())
@@ -217,13 +221,13 @@ class JokerPositionStrategy(abc.ABC):
 
     @classmethod
     @abc.abstractmethod
-    def apply(cls, cards):
+    def apply(cls, cards, rng=random):
         pass
 
 
 class JokerFirst(JokerPositionStrategy):
     @classmethod
-    def apply(cls, cards):
+    def apply(cls, cards, rng=random):
         """Reveal the joker as soon as possible."""
         joker_index = -1
         for i in range(len(cards)):
@@ -246,7 +250,7 @@ class JokerFirst(JokerPositionStrategy):
 
 class JokerLast(JokerPositionStrategy):
     @classmethod
-    def apply(cls, cards):
+    def apply(cls, cards, rng=random):
         """Hide the joker as long as possible."""
         joker_index = -1
         for i in range(len(cards)):
@@ -269,14 +273,14 @@ class JokerLast(JokerPositionStrategy):
 
 class JokerAnywhere(JokerPositionStrategy):
     @classmethod
-    def apply(cls, cards):
+    def apply(cls, cards, rng=random):
         """Put the joker anywhere within the deck."""
         cls.biggest_to_delegate(cards)
 
 
 class JokerNotFirst(JokerPositionStrategy):
     @classmethod
-    def apply(cls, cards):
+    def apply(cls, cards, rng=random):
         """Put the joker anywhere but in the first position."""
         joker_index = -1
         for i in range(len(cards)):
@@ -391,7 +395,7 @@ class OffenseDeckChoiceStrategy(abc.ABC):
     @staticmethod
     @abc.abstractmethod
     def apply(decks_me, decks_opponent, points_me, num_shout_die_me,
-              points_opponent, num_shout_die_opponent):
+              points_opponent, num_shout_die_opponent, rng=random):
         pass
 
 
@@ -399,7 +403,7 @@ class BiggestOffenseDeck(OffenseDeckChoiceStrategy):
     @staticmethod
     def apply(decks_me, decks_opponent=None, points_me=None,
               num_shout_die_me=None, points_opponent=None,
-              num_shout_die_opponent=None):
+              num_shout_die_opponent=None, rng=random):
         undisclosed_decks_me = [deck for deck in decks_me if
                                 deck.is_undisclosed()]
         return max(undisclosed_decks_me, key=lambda x: x.index)
@@ -409,16 +413,16 @@ class AnyOffenseDeck(OffenseDeckChoiceStrategy):
     @staticmethod
     def apply(decks_me, decks_opponent=None, points_me=None,
               num_shout_die_me=None, points_opponent=None,
-              num_shout_die_opponent=None):
+              num_shout_die_opponent=None, rng=random):
         undisclosed_decks = [deck for deck in decks_me if deck.is_undisclosed()]
-        return random.choice(undisclosed_decks)
+        return rng.choice(undisclosed_decks)
 
 
 class DefenseDeckChoiceStrategy(abc.ABC):
     @staticmethod
     @abc.abstractmethod
     def apply(decks_opponent, decks_me, points_me, num_shout_die_me,
-              points_opponent, num_shout_die_opponent):
+              points_opponent, num_shout_die_opponent, rng=random):
         pass
 
 
@@ -426,7 +430,7 @@ class SmallestDefenseDeck(DefenseDeckChoiceStrategy):
     @staticmethod
     def apply(decks_opponent, decks_me=None, points_me=None,
               num_shout_die_me=None, points_opponent=None,
-              num_shout_die_opponent=None):
+              num_shout_die_opponent=None, rng=random):
         undisclosed_decks_opponent = [deck for deck in decks_opponent if
                                       deck.is_undisclosed()]
         return min(undisclosed_decks_opponent, key=lambda x: x.index)
@@ -436,17 +440,17 @@ class AnyDefenseDeck(DefenseDeckChoiceStrategy):
     @staticmethod
     def apply(decks_opponent, decks_me=None, points_me=None,
               num_shout_die_me=None, points_opponent=None,
-              num_shout_die_opponent=None):
+              num_shout_die_opponent=None, rng=random):
         undisclosed_decks = [deck for deck in decks_opponent if
                              deck.is_undisclosed()]
-        return random.choice(undisclosed_decks)
+        return rng.choice(undisclosed_decks)
 
 
 class StatsConsideredBiggest(DefenseDeckChoiceStrategy):
     @staticmethod
     def apply(decks_opponent, decks_me=None, points_me=None,
               num_shout_die_me=None, points_opponent=None,
-              num_shout_die_opponent=None):
+              num_shout_die_opponent=None, rng=random):
         undisclosed_decks = [deck for deck in decks_opponent if
                              deck.is_undisclosed()]
         remaining_die_opponent = constants.MAX_DIE - num_shout_die_opponent
@@ -460,7 +464,7 @@ class ActionChoiceStrategy(abc.ABC):
     @abc.abstractmethod
     def apply(round_, in_turn, decks_me, decks_opponent, num_shout_die_me,
               is_opponent_red, num_shout_die_opponent, points_me,
-              points_opponent):
+              points_opponent, rng=random):
         pass
 
 
@@ -468,19 +472,19 @@ class SimpleActionChoiceStrategy(ActionChoiceStrategy):
     @staticmethod
     def apply(round_, in_turn, decks_me, decks_opponent, num_shout_die_me,
               is_opponent_red, num_shout_die_opponent=None, points_me=None,
-              points_opponent=None):
+              points_opponent=None, rng=random):
         if not ComputerPlayer.undisclosed_values(decks_me):
             return constants.Action.DONE
         elif round_ in (1, 2):
             odds_win, odds_draw, odds_lose = ComputerPlayer.get_chances(
-                decks_me, decks_opponent, is_opponent_red)
+                decks_me, decks_opponent, is_opponent_red, rng=rng)
             if in_turn:
                 odds_lose += odds_draw
             else:
                 odds_win += odds_draw
             if num_shout_die_me < constants.MAX_DIE:
                 if odds_lose > odds_win + .1:
-                    if random.random() < .7:
+                    if rng.random() < .7:
                         return constants.Action.DIE
             return constants.Action.DARE
         elif round_ == 3:
@@ -595,24 +599,37 @@ class ShoutKeypressInput(ShoutInput):
         self._keys_pressed = keys_pressed
 
     @classmethod
-    def from_human(cls, keys_to_hook=None, timeout=0):
+    def from_human(cls, keys_to_hook=None, timeout=0, key_groups=None):
+        """collect the keys pressed within timeout seconds
+
+        Sleeps on an event instead of polling the clock. If key_groups (one
+        group of keys per player) is given, it returns as soon as a key of
+        every group has been pressed, since only the first shout of each
+        player counts anyway.
+        """
         def when_key_pressed(x):
-            keyboard.unhook_key(x.name)
-            keys_pressed.append(x.name)
+            with lock:
+                keyboard.unhook_key(x.name)
+                keys_pressed.append(x.name)
+                pressed.add(x.name)
+                if key_groups and all(pressed.intersection(group) for group
+                                      in key_groups if group):
+                    everyone_shouted.set()
 
         keys_pressed = []
+        pressed = set()
+        lock = threading.Lock()
+        everyone_shouted = threading.Event()
         if keys_to_hook is None:
             keys_to_hook = []
         else:
             keys_to_hook = (key for key in keys_to_hook if key is not None)
         for key in keys_to_hook:
             keyboard.on_press_key(key, when_key_pressed)
-        over = False
-        start = time.time()
-        while not over:
-            over = time.time() - start > timeout
-        keyboard.unhook_all()
-        keys_str = ''.join(keys_pressed)
+        everyone_shouted.wait(timeout)
+        with lock:
+            keyboard.unhook_all()
+            keys_str = ''.join(keys_pressed)
         return cls(keys_str)
 
     @property
@@ -633,9 +650,9 @@ class PlayerOrder(abc.ABC):
 
 
 class RandomPlayerOrder(PlayerOrder):
-    def __init__(self, player1, player2):
+    def __init__(self, player1, player2, rng=random):
         super().__init__(player1, player2)
-        if random.random() > .5:
+        if rng.random() > .5:
             self._first = self._player1
             self._second = self._player2
         else:
@@ -657,14 +674,31 @@ class ReverseOrder(PlayerOrder):
         self._second = self._player1
 
 
+def _without_rng(state):
+    """the state to pickle, since a random generator is not a game state"""
+    if 'rng' not in state:
+        return state
+    state = dict(state)
+    del state['rng']
+    return state
+
+
 class Game(object):
+    rng = random  # the random module unless a seeded generator is given
+
     def __init__(self, player_red=None, player_black=None, over=False,
                  time_started=None, time_ended=None, winner=None, loser=None,
-                 result=None, duels=None, *args):
+                 result=None, duels=None, headless=False, rng=None, *args):
         self.player_red = player_red  # takes the red pile and gets to go first
         self.player_black = player_black
+        if rng is not None:  # one stream for the whole game
+            self.rng = rng
+            for player in (player_red, player_black):
+                if player is not None:
+                    player.rng = rng
         self._over = over
-        if time_started is None:
+        self.headless = headless  # skip messages and timestamps
+        if time_started is None and not headless:
             time_started = time.time()
         self.time_started = time_started
         self.time_ended = time_ended
@@ -675,12 +709,29 @@ class Game(object):
         if duels is None:
             duels = []
             for i in range(constants.DECK_PER_PILE):
-                new_duel = Duel(player_red, player_black, i)
+                new_duel = Duel(player_red, player_black, i, headless=headless)
                 duels.append(new_duel)
             self.duels = tuple(duels)
         self.duel_ongoing = None
-        self.red_pile = RedPile().cards
-        self.black_pile = BlackPile().cards
+
+    def __getstate__(self):
+        return _without_rng(self.__dict__)
+
+    @classmethod
+    def named(cls, name):
+        """this class or the subclass of it called name"""
+        classes = [cls]
+        while classes:
+            class_ = classes.pop()
+            if class_.__name__ == name:
+                return class_
+            classes.extend(class_.__subclasses__())
+        raise ValueError('Unknown game class: {}'.format(name))
+
+    @classmethod
+    def replay_options(cls, metadata, player_red, player_black):
+        """keyword arguments that rebuild a game of this class from a log"""
+        return {}
 
     @property
     def players(self):
@@ -705,11 +756,18 @@ class Game(object):
     def is_over(self):
         return self._over
 
+    def _message(self, template, *args):
+        """format a message unless nobody is going to read it"""
+        if self.headless:
+            return None
+        return template.format(*args)
+
     def prepare(self):
         duel = self.duel_ongoing
         action_prompt = 'What will you two do?\nEnter your action!'
         if duel.offense.deck_in_duel is None:
-            message = 'Duel #{} started! Time to choose the offense deck.'.format(
+            message = self._message(
+                'Duel #{} started! Time to choose the offense deck.',
                 duel.index + 1)
             duration = constants.Duration.BEFORE_DECK_CHOICE
         elif duel.defense.deck_in_duel is None:
@@ -748,27 +806,35 @@ class Game(object):
         round_ = duel.round_
         if all(isinstance(player, HumanPlayer) for player in self.players):
             keys = []
+            key_groups = []
             for player in self.players:
                 valid_actions = player.valid_actions(round_)
+                group = set()
                 for action in valid_actions:
                     key = player.key_settings.get(action)
                     keys.append(key)
-            shout_input = ShoutKeypressInput.from_human(keys, timeout)
+                    if key is not None:
+                        group.add(key)
+                key_groups.append(group)
+            shout_input = ShoutKeypressInput.from_human(keys, timeout,
+                                                        key_groups)
             return shout_input
         else:
-            shouts = []
-            for player in duel.players:
-                in_turn = player == duel.offense
-                opponent = duel.defense if in_turn else duel.offense
-                shout = player.shout(opponent.decks, opponent.points,
-                                     opponent.num_shout_die, round_, in_turn,
-                                     duel.index, prev_envstate)
-                action = shout.action
-                shout = Shout(player, action)
-                shouts.append(shout)
+            shouts = [self.shout_of(player, prev_envstate) for player in
+                      duel.players]
             shout_input = ShoutInput(shouts)
             return shout_input
 
+    def shout_of(self, player, prev_envstate=None):
+        """ask one player of the ongoing duel for a shout"""
+        duel = self.duel_ongoing
+        in_turn = player == duel.offense
+        opponent = duel.defense if in_turn else duel.offense
+        shout = player.shout(opponent.decks, opponent.points,
+                             opponent.num_shout_die, duel.round_, in_turn,
+                             duel.index, prev_envstate)
+        return Shout(player, shout.action)
+
     def process(self, intra_duel_input):
         if isinstance(intra_duel_input, OffenseDeckIndexInput):
             return self.process_offense_deck_index_input(intra_duel_input)
@@ -824,7 +890,8 @@ class Game(object):
                     if player.is_done():  # correct done
                         duel.end(constants.DuelState.ABORTED_BY_CORRECT_DONE)
                         self._end(constants.GameResult.DONE, winner=player)
-                        message = "{0} is done, so Duel #{1} is aborted.\n{0} wins! The game has ended as {0} first shouted done correctly.".format(
+                        message = self._message(
+                            "{0} is done, so Duel #{1} is aborted.\n{0} wins! The game has ended as {0} first shouted done correctly.",
                             player.name, duel.index + 1)
                         duration = constants.Duration.AFTER_GAME_ENDS
                         return message, duration
@@ -834,7 +901,8 @@ class Game(object):
                 if player.recent_action == constants.Action.DIE:
                     player.num_shout_die += 1
                     duel.end(constants.DuelState.DIED)
-                    message = "{} died, so no one gets a point. Duel #{} ended.".format(
+                    message = self._message(
+                        "{} died, so no one gets a point. Duel #{} ended.",
                         player.name, duel.index + 1)
                     duration = constants.Duration.AFTER_DUEL_ENDS
                     return message, duration
@@ -845,19 +913,21 @@ class Game(object):
                     player.num_shout_draw += 1
                     if duel.is_drawn():  # correct draw
                         duel.end(constants.DuelState.DRAWN, player)
-                        message = '{} shouted draw correctly and gets a point. Duel #{} ended.'.format(
-                            player.name, duel.index + 1)
+                        template = '{0} shouted draw correctly and gets a point. Duel #{1} ended.'
                         duration = constants.Duration.AFTER_DUEL_ENDS
                         if duel.winner.points == constants.REQUIRED_POINTS:
                             self._end(constants.GameResult.FINISHED,
                                       winner=duel.winner)
-                            message += "\n{0} wins! The game has ended as {0} first scored {1} points.".format(
-                                duel.winner.name, constants.REQUIRED_POINTS)
+                            template += "\n{0} wins! The game has ended as {0} first scored {2} points."
                             duration = constants.Duration.AFTER_GAME_ENDS
+                        message = self._message(template, player.name,
+                                                duel.index + 1,
+                                                constants.REQUIRED_POINTS)
                         return message, duration
         if round_ in (1, 2):
             duration = constants.Duration.BEFORE_CARD_OPEN
-            message = "Ooh, double dare! Next cards will be opened in {} seconds!".format(
+            message = self._message(
+                "Ooh, double dare! Next cards will be opened in {} seconds!",
                 duration)
             # do nothing and move on to next round to open next cards
             return message, duration
@@ -866,25 +936,22 @@ class Game(object):
             sum_defense = sum(card._value for card in duel.defense.deck_in_duel)
             if sum_offense > sum_defense:
                 duel.end(constants.DuelState.FINISHED, winner=duel.offense)
-                message = '{0} has a greater sum, so {0} gets a point. Duel #{1} ended.'.format(
-                    duel.winner.name, duel.index + 1)
+                template = '{0} has a greater sum, so {0} gets a point. Duel #{1} ended.'
             elif sum_offense < sum_defense:
                 duel.end(constants.DuelState.FINISHED, winner=duel.defense)
-                message = '{0} has a greater sum, so {0} gets a point. Duel #{1} ended.'.format(
-                    duel.winner.name, duel.index + 1)
+                template = '{0} has a greater sum, so {0} gets a point. Duel #{1} ended.'
             else:
                 duel.end(constants.DuelState.DRAWN, winner=duel.defense)
-                message = "The sums are equal, but no one shouted draw, so the defense ({}) gets a point. Duel #{} ended.".format(
-                    duel.winner.name, duel.index + 1)
+                template = "The sums are equal, but no one shouted draw, so the defense ({0}) gets a point. Duel #{1} ended."
             if duel.winner.points == constants.REQUIRED_POINTS:
                 self._end(constants.GameResult.FINISHED, winner=duel.winner)
-                message += "\n{0} wins! The game has ended as {0} first scored {1} points.".format(
-                    duel.winner.name, constants.REQUIRED_POINTS)
+                template += "\n{0} wins! The game has ended as {0} first scored {2} points."
                 duration = constants.Duration.AFTER_GAME_ENDS
-                return message, duration
             else:
                 duration = constants.Duration.AFTER_DUEL_ENDS
-                return message, duration
+            message = self._message(template, duel.winner.name,
+                                    duel.index + 1, constants.REQUIRED_POINTS)
+            return message, duration
         raise ValueError('Invalid round.')
 
     def process_offense_deck_index_input(self, intra_duel_input):
@@ -894,7 +961,8 @@ class Game(object):
         offense_deck = offense.decks[index]
         if offense_deck.is_undisclosed():
             duel.summon(offense_deck)
-            message = 'Deck #{} chosen as the offense deck.'.format(index + 1)
+            message = self._message('Deck #{} chosen as the offense deck.',
+                                    index + 1)
         else:
             message = 'Choose an undisclosed deck.'
         duration = constants.Duration.AFTER_DECK_CHOICE
@@ -906,7 +974,8 @@ class Game(object):
         defense_deck = duel.defense.decks[index]
         if defense_deck.is_undisclosed():
             duel.summon(defense_deck=defense_deck)
-            message = 'Deck #{} chosen as the defense deck.'.format(index + 1)
+            message = self._message('Deck #{} chosen as the defense deck.',
+                                    index + 1)
         else:
             message = 'Choose an undisclosed deck.'
         duration = constants.Duration.AFTER_DECK_CHOICE
@@ -943,7 +1012,8 @@ class Game(object):
     def _end(self, result, winner=None, loser=None):
         self._over = True
         self.result = result
-        self.time_ended = time.time()
+        if not self.headless:
+            self.time_ended = time.time()
         self.winner = winner
         self.loser = loser
         if self.winner is None:
@@ -966,6 +1036,16 @@ class Game(object):
     def to_json(self):
         return jsonpickle.encode(self)
 
+    def to_compact(self):
+        return CompactGameState.from_game(self)
+
+    def to_bytes(self):
+        return self.to_compact().to_bytes()
+
+    @classmethod
+    def from_compact(cls, state, player_red, player_black, *args, **kwargs):
+        return state.to_game(player_red, player_black, cls, *args, **kwargs)
+
     def to_array(self, by_red=None):
         color = -1 if by_red is None else 0 if by_red else 1
         if by_red is None:  # observe both players' data
@@ -989,14 +1069,19 @@ class Game(object):
 
 
 class Player(object):
+    ALL_VALUES_MASK = (1 << len(constants.Rank)) - 1
+    rng = random  # set by Game when the game has its own generator
+
     def __init__(self, name=None, deck_in_duel_index=None, points=0,
                  num_shout_die=0, num_shout_done=0, num_shout_draw=0,
                  decks=None, pile=None, key_settings=None, alias=None,
                  recent_action=None, joker_value_strategy=None,
                  joker_position_strategy=None, offense_deck_index_strategy=None,
                  defense_deck_index_strategy=None, action_choice_strategy=None,
-                 *args, **kwargs):
+                 rng=None, *args, **kwargs):
         self.name = name
+        if rng is not None:
+            self.rng = rng
         self._deck_in_duel_index = deck_in_duel_index
         self.deck_in_duel = None
         self.points = points
@@ -1004,6 +1089,16 @@ class Player(object):
         self.num_shout_done = num_shout_done
         self.num_shout_draw = num_shout_draw
         self.decks = decks
+        # bit (value - 1) is set once a card of that value is disclosed
+        if decks is None:
+            self.disclosed_mask = 0
+        else:
+            self.disclosed_mask = self.scan_disclosed_mask(decks)
+        # HiddenCards index of every open card, as the opponent sees them
+        if decks is None:
+            self.open_cards_index = 0
+        else:
+            self.open_cards_index = HiddenCards.index_of(decks)
         self.pile = pile
         if key_settings is None:
             key_settings = {action: '' for action in constants.Action}
@@ -1016,6 +1111,24 @@ class Player(object):
         self.defense_deck_index_strategy = defense_deck_index_strategy
         self.action_choice_strategy = action_choice_strategy
 
+    def __getstate__(self):
+        return _without_rng(self.__dict__)
+
+    def __getattr__(self, name):
+        """scan for the running mask and index of a game saved without them
+
+        jsonpickle restores such saves attribute by attribute, without
+        calling __setstate__, so they are filled in on first access.
+        """
+        if name not in ('disclosed_mask', 'open_cards_index'):
+            raise AttributeError(name)
+        decks = self.__dict__.get('decks')
+        self.disclosed_mask = 0 if decks is None else \
+            self.scan_disclosed_mask(decks)
+        self.open_cards_index = 0 if decks is None else \
+            HiddenCards.index_of(decks)
+        return getattr(self, name)
+
     @property
     def deck_in_duel_index(self):
         return self._deck_in_duel_index
@@ -1063,23 +1176,25 @@ class Player(object):
 
     def build_decks(self):
         pile = list(self.pile)
-        random.shuffle(pile)
+        self.rng.shuffle(pile)
         decks_previous = []
         for j in range(constants.DECK_PER_PILE):
             cards = []
             for k in range(constants.CARD_PER_DECK):
                 new_card = pile.pop()
                 cards.append(new_card)
-            self.joker_value_strategy.apply(cards)
-            self.joker_position_strategy.apply(cards)
+            self.joker_value_strategy.apply(cards, self.rng)
+            self.joker_position_strategy.apply(cards, self.rng)
             decks_previous.append(tuple(cards))
         decks_previous.sort(key=lambda x: x[0]._value)
         decks = []
+        self.open_cards_index = 0
         for index, cards in enumerate(decks_previous):
-            deck = Deck(cards, index=index)
-            deck.delegate.open_up()
+            deck = Deck(cards, index=index, owner=self)
+            self.open_card(deck.delegate)
             decks.append(deck)
         self.decks = tuple(decks)
+        self.disclosed_mask = 0
 
     def reset(self):
         self._deck_in_duel_index = None
@@ -1089,6 +1204,8 @@ class Player(object):
         self.num_shout_done = 0
         self.num_shout_draw = 0
         self.decks = None
+        self.disclosed_mask = 0
+        self.open_cards_index = 0
         self.pile = None
         self.key_settings = {action: '' for action in constants.Action}
         self.alias = None
@@ -1108,22 +1225,66 @@ class Player(object):
         self.deck_in_duel = deck
         self._deck_in_duel_index = deck.index
         deck.enter_duel(opponent_deck=opponent_deck)
+        for card in deck:
+            if card.open_:
+                self.disclose(card)
 
     def open_next_card(self):
         deck = self.decks[self._deck_in_duel_index]
         if deck.card_to_open_index is None:
             deck.card_to_open_index = 1
         card_to_open = deck[deck.card_to_open_index]
-        card_to_open.open_up()
+        self.open_card(card_to_open)
+        self.disclose(card_to_open)
         deck.card_to_open_index += 1
         if deck.card_to_open_index == 3:
             deck.card_to_open_index = None
 
+    def open_card(self, card):
+        """open a card of this player's decks, counting it once"""
+        if not card.open_:
+            card.open_up()
+            self.open_cards_index += HiddenCards.weight_of(card)
+
+    def disclose(self, card):
+        """record an open card of a deck that has entered a duel"""
+        if card._value is not None:
+            self.disclosed_mask |= 1 << (card._value - 1)
+
+    @staticmethod
+    def scan_disclosed_mask(decks):
+        mask = 0
+        for deck in decks:
+            if not deck.is_undisclosed():
+                for card in deck.cards:
+                    if card.open_ and card._value is not None:
+                        mask |= 1 << (card._value - 1)
+        return mask
+
+    @staticmethod
+    def disclosed_mask_of(decks):
+        """the owner's running mask if decks are a player's, else a scan"""
+        owner = decks[0].owner if decks else None
+        if owner is not None and owner.decks is decks:
+            return owner.disclosed_mask
+        return Player.scan_disclosed_mask(decks)
+
+    @staticmethod
+    def open_cards_index_of(decks):
+        """the owner's running index if decks are a player's, else a scan"""
+        owner = decks[0].owner if decks else None
+        if owner is not None and owner.decks is decks:
+            return owner.open_cards_index
+        return HiddenCards.index_of(decks)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def values_in_mask(mask):
+        return tuple(rank.value for rank in constants.Rank if
+                     mask >> (rank.value - 1) & 1)
+
     def is_done(self):
-        disclosed_values = ComputerPlayer.disclosed_values(self.decks)
-        num_disclosed_values = len(disclosed_values)
-        num_all_values = len(constants.Rank)
-        return num_disclosed_values == num_all_values
+        return self.disclosed_mask == self.ALL_VALUES_MASK
 
     def to_array(self, public_only=False):
         decks = [deck.to_array(public_only=public_only) for deck in self.decks]
@@ -1200,7 +1361,8 @@ class ComputerPlayer(Player):
     def __init__(self, forbidden_name=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if self.name is None:
-            self.name = NameTextInput.auto_generate(forbidden_name).value
+            self.name = NameTextInput.auto_generate(forbidden_name,
+                                                    self.rng).value
         if self.joker_value_strategy is None:
             self.joker_value_strategy = RandomNumber
         if self.joker_position_strategy is None:
@@ -1217,7 +1379,7 @@ class ComputerPlayer(Player):
         strategy = self.offense_deck_index_strategy
         deck = strategy.apply(self.decks, decks_opponent, self.points,
                               self.num_shout_die, points_opponent,
-                              num_shout_die_opponent)
+                              num_shout_die_opponent, self.rng)
         return deck.index
 
     def decide_defense_deck_index(self, decks_opponent, points_opponent,
@@ -1225,16 +1387,20 @@ class ComputerPlayer(Player):
         strategy = self.defense_deck_index_strategy
         deck = strategy.apply(decks_opponent, self.decks, self.points,
                               self.num_shout_die, points_opponent,
-                              num_shout_die_opponent)
+                              num_shout_die_opponent, self.rng)
         return deck.index
 
     @staticmethod
     def get_chances(decks_me, decks_opponent, is_opponent_red,
                     deck_in_duel_me=None,
                     deck_in_duel_opponent=None,
-                    joker_value_strategy_me=SameAsMax):
+                    joker_value_strategy_me=SameAsMax, rng=random):
         """get chances of winning, tying, and losing
         assuming the opponent uses SameAsMax as its joker value strategy
+
+        A joker guessed with a random value draws that value once per call
+        rather than once per pair of hands, so the odds for such a joker can
+        differ from a full enumeration by the spread of that single draw.
         """
 
         def guess_joker_value(delegate_value, joker_value_strategy=SameAsMax):
@@ -1248,7 +1414,7 @@ class ComputerPlayer(Player):
             elif joker_value_strategy == NextBiggest:
                 return delegate_value - 1
             else:
-                return random.randint(1, delegate_value)
+                return rng.randint(1, delegate_value)
 
         # get my hidden cards
         if deck_in_duel_me is None:
@@ -1257,12 +1423,15 @@ class ComputerPlayer(Player):
         current_sum_me = sum(
             card._value for card in deck_in_duel_me if card.open_)
         delegate_value_me = deck_in_duel_me.delegate_value
-        hidden_cards_me = []
+        hidden_values_me = []
         for deck in decks_me:
             for card in deck:
                 if not card.open_:
-                    if card._is_joker() or card._value <= delegate_value_me:
-                        hidden_cards_me.append(card)
+                    if card._is_joker():
+                        hidden_values_me.append(guess_joker_value(
+                            delegate_value_me, joker_value_strategy_me))
+                    elif card._value <= delegate_value_me:
+                        hidden_values_me.append(card._value)
         # get the number of cards to open
         num_opened = sum(1 for card in deck_in_duel_me if card.open_)
         num_to_open = 3 - num_opened
@@ -1274,77 +1443,86 @@ class ComputerPlayer(Player):
             card._value for card in deck_in_duel_opponent if
             card.open_)
         delegate_value_opponent = deck_in_duel_opponent.delegate_value
-        hidden_cards_opponent = []
-
-        if is_opponent_red:
-            entire_pile = RedPile()
-            unopened_pile = RedUnopenedPile(entire_pile.cards)
-        else:
-            entire_pile = BlackPile()
-            unopened_pile = BlackUnopenedPile(entire_pile.cards)
-        for deck in decks_opponent:
-            for card in deck:
-                if card.open_:
-                    try:
-                        unopened_pile.remove(card)
-                    except ValueError:
-                        pass
-        for card in unopened_pile:
-            if card._is_joker() or card._value <= delegate_value_opponent:
-                hidden_cards_opponent.append(card)
+        # both piles have the same ranks, so is_opponent_red does not matter
+        index = Player.open_cards_index_of(decks_opponent)
+        hidden_values_opponent, joker_hidden = HiddenCards.hidden_values(
+            index, delegate_value_opponent)
+        if joker_hidden:
+            hidden_values_opponent = tuple(sorted(
+                hidden_values_opponent +
+                (guess_joker_value(delegate_value_opponent),)))
         # calculate the odds
-        num_win, num_lose, num_draw = 0, 0, 0
-        candidates_me = list(
-            itertools.combinations(hidden_cards_me, num_to_open))
-        candidates_opponent = list(itertools.combinations(hidden_cards_opponent,
-                                                          num_to_open))
-        for cards_me in candidates_me:
-            for cards_opponent in candidates_opponent:
-                # get my sum
-                sum_me = current_sum_me
-                for card in cards_me:
-                    if card._is_joker():
-                        sum_me += guess_joker_value(delegate_value_me,
-                                                    joker_value_strategy_me)
-                    else:
-                        sum_me += card._value
-                # get opponent's sum
-                sum_opponent = current_sum_opponent
-                for card in cards_opponent:
-                    if card._is_joker():
-                        sum_opponent += guess_joker_value(
-                            delegate_value_opponent)
-                    else:
-                        sum_opponent += card._value
-                # compare
-                if sum_me > sum_opponent:
-                    num_win += 1
-                elif sum_me == sum_opponent:
-                    num_draw += 1
-                else:
-                    num_lose += 1
-        total = num_win + num_draw + num_lose
+        return ComputerPlayer._chances(
+            tuple(sorted(hidden_values_me)), current_sum_me,
+            hidden_values_opponent, current_sum_opponent, num_to_open)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=2 ** 16)
+    def _chances(hidden_values_me, current_sum_me, hidden_values_opponent,
+                 current_sum_opponent, num_to_open):
+        """compare the sum distributions of both hands
+
+        Hidden values are sorted tuples so that equal multisets share a cache
+        entry. The counts are exact, so the odds match a pairwise enumeration
+        of every combination of hidden cards.
+        """
+        sums_me = ComputerPlayer._sum_counts(hidden_values_me, num_to_open)
+        sums_opponent = ComputerPlayer._sum_counts(hidden_values_opponent,
+                                                   num_to_open)
+        length = max(current_sum_me + len(sums_me),
+                     current_sum_opponent + len(sums_opponent))
+        counts_me = numpy.zeros(length, dtype=numpy.int64)
+        counts_me[current_sum_me:current_sum_me + len(sums_me)] = sums_me
+        counts_opponent = numpy.zeros(length, dtype=numpy.int64)
+        counts_opponent[current_sum_opponent:
+                        current_sum_opponent + len(sums_opponent)] = \
+            sums_opponent
+        cumulative_opponent = numpy.cumsum(counts_opponent)
+        num_win = int(numpy.dot(counts_me[1:], cumulative_opponent[:-1]))
+        num_draw = int(numpy.dot(counts_me, counts_opponent))
+        total = int(counts_me.sum()) * int(counts_opponent.sum())
+        num_lose = total - num_win - num_draw
         odds_win = round(num_win / total, 3)
         odds_draw = round(num_draw / total, 3)
         odds_lose = round(num_lose / total, 3)
         return odds_win, odds_draw, odds_lose
 
-    @classmethod
-    def undisclosed_values(cls, decks):
-        values = set(rank.value for rank in constants.Rank)
-        disclosed_values = set(cls.disclosed_values(decks))
-        undisclosed_values = values.difference(disclosed_values)
-        return tuple(undisclosed_values)
+    @staticmethod
+    @functools.lru_cache(maxsize=2 ** 12)
+    def _sum_counts(values, num_to_pick):
+        """count the ways to pick num_to_pick of the values, indexed by sum
+
+        The counts are the coefficients of the elementary symmetric polynomial
+        of the value histogram, built from its power sums by convolution with
+        Newton's identities.
+        """
+        if values:
+            histogram = numpy.bincount(values)
+        else:
+            histogram = numpy.zeros(1, dtype=numpy.int64)
+        max_value = len(histogram) - 1
+        power_sums = [None]
+        for i in range(1, num_to_pick + 1):
+            power_sum = numpy.zeros(i * max_value + 1, dtype=numpy.int64)
+            power_sum[::i] = histogram
+            power_sums.append(power_sum)
+        elementary = [numpy.ones(1, dtype=numpy.int64)]
+        for k in range(1, num_to_pick + 1):
+            total = numpy.zeros(k * max_value + 1, dtype=numpy.int64)
+            for i in range(1, k + 1):
+                term = numpy.convolve(elementary[k - i], power_sums[i])
+                total[:len(term)] += (-1) ** (i - 1) * term
+            elementary.append(total // k)
+        return elementary[num_to_pick]
+
+    @staticmethod
+    def undisclosed_values(decks):
+        mask = Player.disclosed_mask_of(decks)
+        return Player.values_in_mask(Player.ALL_VALUES_MASK ^ mask)
 
     @staticmethod
     def disclosed_values(decks):
-        values = set()
-        for deck in decks:
-            if not deck.is_undisclosed():
-                for card in deck.cards:
-                    if card.open_:
-                        values.add(card._value)
-        return tuple(values)
+        return Player.values_in_mask(Player.disclosed_mask_of(decks))
 
     def shout(self, decks_opponent, points_opponent, num_shout_die_opponent,
               round_, in_turn, duel_index, prev_envstate=None):
@@ -1353,7 +1531,7 @@ class ComputerPlayer(Player):
         action = strategy.apply(round_, in_turn, self.decks, decks_opponent,
                                 self.num_shout_die, is_opponent_red,
                                 num_shout_die_opponent, self.points,
-                                points_opponent)
+                                points_opponent, self.rng)
         return Shout(self, action)
 
 
@@ -1449,13 +1627,17 @@ class Card(object):
 
 
 class Deck(object):
+    owner = None  # for saves from before decks knew their owner
+
     def __init__(self, cards, state=constants.DeckState.UNDISCLOSED, index=None,
-                 opponent_deck_index=None, card_to_open_index=None):
+                 opponent_deck_index=None, card_to_open_index=None,
+                 owner=None):
         self._state = state
         self._cards = cards
         self._index = index  # zero based
         self._opponent_deck_index = opponent_deck_index
         self.card_to_open_index = card_to_open_index
+        self.owner = owner
 
     def __str__(self):
         return ' / '.join(str(card) for card in self._cards)
@@ -1564,11 +1746,12 @@ class Duel(object):
     def __init__(self, player_red, player_black, index, time_started=None,
                  round_=1, over=False, time_ended=None, winner=None, loser=None,
                  state=constants.DuelState.UNSTARTED, offense=None,
-                 defense=None):
+                 defense=None, headless=False):
         self.player_red = player_red
         self.player_black = player_black
         self._index = index
-        if time_started is None:
+        self.headless = headless
+        if time_started is None and not headless:
             self.time_started = time.time()
         else:
             self.time_started = time_started
@@ -1633,7 +1816,8 @@ class Duel(object):
 
     def end(self, state, winner=None, loser=None):
         self._over = True
-        self.time_ended = time.time()
+        if not self.headless:
+            self.time_ended = time.time()
         if state.value not in range(3, 11):
             raise ValueError('Invalid DeckState.')
         self._state = state
@@ -1660,7 +1844,8 @@ class Duel(object):
             if player.deck_in_duel is not None:
                 player.deck_in_duel.finish()
                 for card in player.deck_in_duel:
-                    card.open_up()
+                    player.open_card(card)
+                    player.disclose(card)
                 player.deck_in_duel = None
 
 
@@ -1668,21 +1853,6 @@ class Pile(object):
     pass
 
 
-class UnopenedPile(collections.UserList):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        for card in self:
-            card.open_up()
-
-
-class RedUnopenedPile(UnopenedPile):
-    pass
-
-
-class BlackUnopenedPile(UnopenedPile):
-    pass
-
-
 class RedPile(Pile):
     def __init__(self, cards=None):
         if cards is None:
@@ -1721,128 +1891,815 @@ class BlackPile(Pile):
         return self._cards
 
 
-class OutputHandler(object):
+# the canonical pile, only ever read; Game.distribute_piles deals fresh cards
+RED_PILE = tuple(RedPile().cards)
+
+
+class HiddenCards(object):
+    """the hidden cards of a pile, given by an index of its open cards
+
+    A pile has two cards of each rank and a joker, so its open cards come
+    down to a count from 0 to 2 per rank and a joker bit, packed into
+    sum(count * 3 ** (value - 1)) + JOKER_OFFSET * joker_open. The hidden
+    cards follow from the base-3 digits of that index. Both colors have the
+    same ranks, so the index means the same for either pile.
+    """
+    NUM_RANKS = len(constants.Rank)
+    JOKER_OFFSET = 3 ** NUM_RANKS
+    WEIGHTS = tuple(3 ** i for i in range(NUM_RANKS))
+    # cards of each value in a whole pile
+    FULL = tuple(sum(1 for card in RED_PILE if card._value == value) for
+                 value in range(1, NUM_RANKS + 1))
+
+    @classmethod
+    def weight_of(cls, card):
+        """how much opening card adds to the index"""
+        if card._is_joker():
+            return cls.JOKER_OFFSET
+        return cls.WEIGHTS[card._value - 1]
+
+    @classmethod
+    def index_of(cls, decks):
+        """the index of the open cards of decks, all from one pile"""
+        return sum(cls.weight_of(card) for deck in decks for card in deck if
+                   card.open_)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=2 ** 16)
+    def hidden_values(index, max_value):
+        """the hidden values up to max_value as a sorted tuple, and whether
+        the joker is hidden
+
+        Cached, so a repeated query allocates nothing.
+        """
+        values = []
+        for value in range(1, max_value + 1):
+            count = HiddenCards.FULL[value - 1] - \
+                index // HiddenCards.WEIGHTS[value - 1] % 3
+            values.extend([value] * count)
+        return tuple(values), index < HiddenCards.JOKER_OFFSET
+
+
+class ObservationEncoder(object):
+    """write Game.to_array observations into a reusable buffer
+
+    The entries are gathered into a scratch list of plain ints and copied
+    into the buffer in one assignment, so no array is allocated per card,
+    deck or player. The buffer is overwritten by the next call.
+    """
+    CARD_SIZE = 5
+    DECK_SIZE = CARD_SIZE * constants.CARD_PER_DECK + 4
+    PLAYER_SIZE = DECK_SIZE * constants.DECK_PER_PILE + 3
+    SIZE = PLAYER_SIZE * 2 + 4
+    RANK_CODES = {rank.name: rank.value for rank in constants.Rank}
+    RANK_CODES.update({constants.JOKER: 0, None: -1})
+
+    def __init__(self, dtype=numpy.int64):
+        self.dtype = dtype
+        self.buffer = numpy.zeros((1, self.SIZE), dtype=dtype)
+        self._scratch = [0] * self.SIZE
+
+    def encode(self, game, by_red=None, out=None):
+        """fill out (the buffer by default) with the observation of game"""
+        self._fill(game, by_red)
+        if out is None:
+            out = self.buffer
+        out[0] = self._scratch
+        return out
+
+    def encode_batch(self, games, by_reds=None, out=None):
+        """encode many games into the rows of one (N, SIZE) array"""
+        if by_reds is None:
+            by_reds = [None] * len(games)
+        if out is None:
+            out = numpy.empty((len(games), self.SIZE), dtype=self.dtype)
+        for row, (game, by_red) in enumerate(zip(games, by_reds)):
+            self._fill(game, by_red)
+            out[row] = self._scratch
+        return out
+
+    def _fill(self, game, by_red):
+        scratch = self._scratch
+        red_public_only = by_red is not None and not by_red
+        black_public_only = by_red is not None and by_red
+        self._fill_player(game.player_red, red_public_only, 0)
+        self._fill_player(game.player_black, black_public_only,
+                          self.PLAYER_SIZE)
+        start = 2 * self.PLAYER_SIZE
+        scratch[start] = -1 if by_red is None else 0 if by_red else 1
+        if game.winner is None:
+            scratch[start + 1] = -1
+        else:
+            scratch[start + 1] = int(game.winner == game.player_red)
+        scratch[start + 2] = -1 if game.result is None else game.result.value
+        scratch[start + 3] = -1 if game.duel_index is None else \
+            game.duel_index
+
+    def _fill_player(self, player, public_only, start):
+        scratch = self._scratch
+        rank_codes = self.RANK_CODES
+        position = start
+        for deck in player.decks:
+            cards = deck._cards
+            for card in cards:
+                colored = -1 if card._colored is None else int(card._colored)
+                if public_only and not card.open_:
+                    scratch[position:position + 5] = (
+                        -1, colored, -1, -1, int(card.open_))
+                else:
+                    suit = card._suit
+                    value = card._value
+                    open_ = card.open_
+                    scratch[position:position + 5] = (
+                        -1 if suit is None else suit.value, colored,
+                        rank_codes[card._rank], -1 if value is None else value,
+                        -1 if open_ is None else int(open_))
+                position += self.CARD_SIZE
+            state = deck._state
+            index = deck._index
+            opponent_deck_index = deck._opponent_deck_index
+            card_to_open_index = deck.card_to_open_index
+            scratch[position:position + 4] = (
+                -1 if state is None else state.value,
+                -1 if index is None else index,
+                -1 if opponent_deck_index is None else opponent_deck_index,
+                -1 if card_to_open_index is None else card_to_open_index)
+            position += 4
+        points = player.points
+        num_shout_die = player.num_shout_die
+        deck_in_duel_index = player._deck_in_duel_index
+        scratch[position:position + 3] = (
+            -1 if points is None else points,
+            -1 if num_shout_die is None else num_shout_die,
+            -1 if deck_in_duel_index is None else deck_in_duel_index)
+
+
+class CompactGameState(object):
+    """array-backed snapshot of a game, for storage and offline queries
+
+    Games are still played on Card, Deck and Player objects. A compact state
+    is taken with Game.to_compact and turned back into a playable game with
+    to_game; nothing in Game, Duel or Player runs on it directly.
+
+    The first axis of every per-player array is the side: 0 for the Player
+    Red and 1 for the Player Black. Decks keep their sorted order and cards
+    keep their order within the deck. Missing values are stored as -1, and a
+    joker has rank 0 and suit 0.
+    """
+    # columns of players
+    POINTS, NUM_SHOUT_DIE, NUM_SHOUT_DONE, NUM_SHOUT_DRAW, \
+        DECK_IN_DUEL_INDEX, RECENT_ACTION = range(6)
+    # columns of duels
+    DUEL_STATE, DUEL_ROUND, DUEL_WINNER = range(3)
+    # entries of summary
+    OVER, RESULT, WINNER, DUEL_INDEX = range(4)
+    # order of the arrays in a binary record
+    FIELDS = ('values', 'ranks', 'suits', 'open_masks', 'deck_states',
+              'opponent_deck_indices', 'card_to_open_indices', 'players',
+              'duels', 'summary')
+
     def __init__(self):
+        card_shape = (2, constants.DECK_PER_PILE, constants.CARD_PER_DECK)
+        deck_shape = (2, constants.DECK_PER_PILE)
+        self.values = numpy.full(card_shape, -1, dtype=numpy.int8)
+        self.ranks = numpy.full(card_shape, -1, dtype=numpy.int8)
+        self.suits = numpy.full(card_shape, -1, dtype=numpy.int8)
+        self.open_masks = numpy.zeros(deck_shape, dtype=numpy.uint8)
+        self.deck_states = numpy.zeros(deck_shape, dtype=numpy.int8)
+        self.opponent_deck_indices = numpy.full(deck_shape, -1,
+                                                dtype=numpy.int8)
+        self.card_to_open_indices = numpy.full(deck_shape, -1,
+                                               dtype=numpy.int8)
+        self.players = numpy.full((2, 6), -1, dtype=numpy.int8)
+        self.duels = numpy.full((constants.DECK_PER_PILE, 3), -1,
+                                dtype=numpy.int8)
+        self.summary = numpy.full(4, -1, dtype=numpy.int8)
+
+    @staticmethod
+    def _optional(value):
+        return -1 if value is None else value
+
+    @classmethod
+    def record_size(cls):
+        state = cls()
+        return sum(getattr(state, field).nbytes for field in cls.FIELDS)
+
+    def to_bytes(self):
+        """a fixed-size record of every array in FIELDS order"""
+        return b''.join(getattr(self, field).tobytes() for field in
+                        self.FIELDS)
+
+    @classmethod
+    def from_bytes(cls, record):
+        state = cls()
+        offset = 0
+        for field in cls.FIELDS:
+            array = getattr(state, field)
+            size = array.nbytes
+            array[...] = numpy.frombuffer(record[offset:offset + size],
+                                          dtype=array.dtype).reshape(
+                array.shape)
+            offset += size
+        return state
+
+    @classmethod
+    def from_game(cls, game):
+        state = cls()
+        for side, player in enumerate(game.players):
+            for deck in player.decks:
+                open_mask = 0
+                for position, card in enumerate(deck):
+                    if card._is_joker():
+                        rank, suit = 0, 0
+                    else:
+                        rank = constants.Rank[card._rank].value
+                        suit = card._suit.value
+                    state.ranks[side, deck.index, position] = rank
+                    state.suits[side, deck.index, position] = suit
+                    state.values[side, deck.index, position] = \
+                        cls._optional(card._value)
+                    if card.open_:
+                        open_mask |= 1 << position
+                state.open_masks[side, deck.index] = open_mask
+                state.deck_states[side, deck.index] = deck.state.value
+                state.opponent_deck_indices[side, deck.index] = \
+                    cls._optional(deck.opponent_deck_index)
+                state.card_to_open_indices[side, deck.index] = \
+                    cls._optional(deck.card_to_open_index)
+            recent_action = player.recent_action
+            state.players[side] = (
+                player.points, player.num_shout_die, player.num_shout_done,
+                player.num_shout_draw,
+                cls._optional(player.deck_in_duel_index),
+                -1 if recent_action is None else recent_action.value)
+        for duel in game.duels:
+            if duel.winner is None:
+                winner = -1
+            else:
+                winner = int(duel.winner == game.player_black)
+            state.duels[duel.index] = (duel._state.value, duel.round_, winner)
+        if game.winner is None:
+            winner = -1
+        else:
+            winner = int(game.winner == game.player_black)
+        result = -1 if game.result is None else game.result.value
+        state.summary[:] = (int(game.is_over()), result, winner,
+                            game.duel_index)
+        return state
+
+    def to_game(self, player_red, player_black, game_class=None, *args,
+                **kwargs):
+        """rebuild a game around the given players so that it can go on"""
+        if game_class is None:
+            game_class = Game
+        players = (player_red, player_black)
+        game = game_class(player_red, player_black, *args, **kwargs)
+        game.player_red.take_pile(RedPile())
+        game.player_black.take_pile(BlackPile())
+        for side, player in enumerate(players):
+            decks = []
+            for deck_index in range(constants.DECK_PER_PILE):
+                cards = []
+                for position in range(constants.CARD_PER_DECK):
+                    rank = int(self.ranks[side, deck_index, position])
+                    suit = int(self.suits[side, deck_index, position])
+                    value = int(self.values[side, deck_index, position])
+                    open_ = bool(self.open_masks[side, deck_index] >>
+                                 position & 1)
+                    card = Card(None if suit == 0 else constants.Suit(suit),
+                                side == 0,
+                                constants.JOKER if rank == 0 else
+                                constants.Rank(rank).name,
+                                None if value == -1 else value, open_)
+                    cards.append(card)
+                opponent_deck_index = int(
+                    self.opponent_deck_indices[side, deck_index])
+                card_to_open_index = int(
+                    self.card_to_open_indices[side, deck_index])
+                deck = Deck(tuple(cards), constants.DeckState(
+                    int(self.deck_states[side, deck_index])), deck_index,
+                            None if opponent_deck_index == -1 else
+                            opponent_deck_index,
+                            None if card_to_open_index == -1 else
+                            card_to_open_index, player)
+                decks.append(deck)
+            player.decks = tuple(decks)
+            player.disclosed_mask = player.scan_disclosed_mask(player.decks)
+            player.open_cards_index = HiddenCards.index_of(player.decks)
+            points, num_shout_die, num_shout_done, num_shout_draw, \
+                deck_in_duel_index, recent_action = \
+                (int(value) for value in self.players[side])
+            player.points = points
+            player.num_shout_die = num_shout_die
+            player.num_shout_done = num_shout_done
+            player.num_shout_draw = num_shout_draw
+            if deck_in_duel_index == -1:
+                player._deck_in_duel_index = None
+                player.deck_in_duel = None
+            else:
+                player._deck_in_duel_index = deck_in_duel_index
+                deck = player.decks[deck_in_duel_index]
+                player.deck_in_duel = deck if deck.is_in_duel() else None
+            if recent_action == -1:
+                player.recent_action = None
+            else:
+                player.recent_action = constants.Action(recent_action)
+        for duel in game.duels:
+            duel_state, round_, winner = (int(value) for value in
+                                          self.duels[duel.index])
+            duel._state = constants.DuelState(duel_state)
+            duel._round = round_
+            duel._over = duel_state not in (
+                constants.DuelState.UNSTARTED.value,
+                constants.DuelState.ONGOING.value)
+            if winner != -1:
+                duel.winner = players[winner]
+                duel.loser = players[1 - winner]
+        over, result, winner, duel_index = (int(value) for value in
+                                            self.summary)
+        game._over = bool(over)
+        game.result = None if result == -1 else constants.GameResult(result)
+        if winner != -1:
+            game.winner = players[winner]
+            game.loser = players[1 - winner]
+        game.duel_index = duel_index
+        if duel_index != -1:
+            game.duel_ongoing = game.duels[duel_index]
+        return game
+
+    def opened(self, side):
+        """boolean array of the open cards of a side, shaped like its decks"""
+        positions = numpy.arange(constants.CARD_PER_DECK, dtype=numpy.uint8)
+        return (self.open_masks[side][:, None] >> positions & 1).astype(bool)
+
+    def undisclosed_deck_indices(self, side):
+        undisclosed = constants.DeckState.UNDISCLOSED.value
+        return numpy.flatnonzero(self.deck_states[side] == undisclosed)
+
+    def disclosed_values(self, side):
+        """values opened in decks that have entered a duel"""
+        undisclosed = constants.DeckState.UNDISCLOSED.value
+        entered = (self.deck_states[side] != undisclosed)[:, None]
+        disclosed = self.opened(side) & entered
+        return tuple(numpy.unique(self.values[side][disclosed]).tolist())
+
+    def is_done(self, side):
+        return len(self.disclosed_values(side)) == len(constants.Rank)
+
+    def revealed_joker(self, side):
+        return bool(numpy.any(self.opened(side) & (self.ranks[side] == 0)))
+
+
+class StateLog(object):
+    """versioned binary log of CompactGameState records
+
+    A log starts with MAGIC, a version byte and a length-prefixed JSON header
+    describing the game, followed by fixed-size records until the end.
+    """
+    MAGIC = b'DoD'
+    VERSION = 1
+    EXTENSION = '.dod'
+    PREFIX = struct.Struct('<3sBI')
+    RECORD_SIZE = CompactGameState.record_size()
+
+    def __init__(self, metadata=None, records=None):
+        self.metadata = {} if metadata is None else metadata
+        self.records = [] if records is None else records
+
+    @staticmethod
+    def describe(game):
+        """names of the players and their strategies, for the header"""
+
+        def name_of(class_):
+            return None if class_ is None else class_.__name__
+
+        metadata = {'game_class': name_of(game.__class__),
+                    'time_started': game.time_started}
+        for key, player in (('red', game.player_red),
+                            ('black', game.player_black)):
+            metadata[key] = {
+                'class': name_of(player.__class__),
+                'name': player.name,
+                'alias': player.alias,
+                'joker_value_strategy': name_of(player.joker_value_strategy),
+                'joker_position_strategy': name_of(
+                    player.joker_position_strategy),
+                'offense_deck_index_strategy': name_of(
+                    player.offense_deck_index_strategy),
+                'defense_deck_index_strategy': name_of(
+                    player.defense_deck_index_strategy),
+            }
+        return metadata
+
+    def append(self, record):
+        self.records.append(record)
+
+    def states(self):
+        return [CompactGameState.from_bytes(record) for record in
+                self.records]
+
+    def encode(self):
+        header = json.dumps(self.metadata).encode('utf-8')
+        prefix = self.PREFIX.pack(self.MAGIC, self.VERSION, len(header))
+        return prefix + header + b''.join(self.records)
+
+    @classmethod
+    def _read_header(cls, data):
+        magic, version, header_size = cls.PREFIX.unpack_from(data)
+        if magic != cls.MAGIC:
+            raise ValueError('This is not a state log.')
+        if version != cls.VERSION:
+            raise ValueError('Unsupported state log version: {}'.format(
+                version))
+        start = cls.PREFIX.size
+        metadata = json.loads(data[start:start + header_size].decode('utf-8'))
+        return metadata, start + header_size
+
+    @classmethod
+    def decode(cls, data):
+        metadata, offset = cls._read_header(data)
+        if (len(data) - offset) % cls.RECORD_SIZE:
+            raise ValueError('Truncated state log.')
+        records = [data[start:start + cls.RECORD_SIZE] for start in
+                   range(offset, len(data), cls.RECORD_SIZE)]
+        return cls(metadata, records)
+
+    def export(self, file_path):
+        with open(file_path, 'wb') as file:
+            file.write(self.encode())
+
+    @classmethod
+    def load(cls, file_path):
+        with open(file_path, 'rb') as file:
+            return cls.decode(file.read())
+
+    @classmethod
+    def read_final_state(cls, file_path):
+        """read the header and the last record without loading the rest"""
+        with open(file_path, 'rb') as file:
+            prefix = file.read(cls.PREFIX.size)
+            _, _, header_size = cls.PREFIX.unpack(prefix)
+            metadata, _ = cls._read_header(prefix + file.read(header_size))
+            file.seek(-cls.RECORD_SIZE, os.SEEK_END)
+            record = file.read(cls.RECORD_SIZE)
+        return metadata, CompactGameState.from_bytes(record)
+
+    @classmethod
+    def from_legacy_json(cls, file_path):
+        """convert a list of jsonpickle game states saved in a JSON file"""
+        output_handler = OutputHandler()
+        output_handler.import_from_json(file_path)
+        log = cls()
+        for game_state_in_json in output_handler.states:
+            game = jsonpickle.decode(game_state_in_json)
+            log.append(CompactGameState.from_game(game).to_bytes())
+        if output_handler.states:
+            log.metadata = cls.describe(game)
+        return log
+
+
+class ReplayLog(object):
+    """the initial deal and the inputs that drove a game
+
+    Any intermediate state is rebuilt on demand by replaying the inputs on
+    the deal. Each input takes one fixed-size event with the state its duel
+    was left in, which is checked while replaying. The final state is kept
+    as well once the game is over so that results can be read directly.
+    """
+    MAGIC = b'DoR'
+    VERSION = 1
+    EXTENSION = '.dor'
+    PREFIX = StateLog.PREFIX
+    EVENT = struct.Struct('<4b')  # kind, first, second, duel state
+    OFFENSE, DEFENSE, SHOUT = range(1, 4)
+    GAME_MODULES = ('rl',)  # where the other game classes are defined
+
+    def __init__(self, metadata=None, deal=None, events=None, final=None):
+        self.metadata = {} if metadata is None else metadata
+        self.deal = deal
+        self.events = [] if events is None else events
+        self.final = final
+
+    @classmethod
+    def start(cls, game):
+        """begin a log from a game whose decks have just been built"""
+        return cls(StateLog.describe(game), game.to_bytes())
+
+    def record(self, user_input, game):
+        """append an input right after the game has processed it"""
+        duel = game.duel_ongoing
+        if isinstance(user_input, OffenseDeckIndexInput):
+            event = (self.OFFENSE, user_input.value, -1)
+        elif isinstance(user_input, DefenseDeckIndexInput):
+            event = (self.DEFENSE, user_input.value, -1)
+        elif isinstance(user_input, ShoutInput):
+            # the actions the game acted on, whoever shouted them
+            event = (self.SHOUT,) + tuple(
+                -1 if player.recent_action is None else
+                player.recent_action.value for player in game.players)
+        else:
+            raise ValueError('Invalid input')
+        self.events.append(event + (duel._state.value,))
+        if game.is_over():
+            self.final = game.to_bytes()
+
+    def encode(self):
+        metadata = dict(self.metadata, num_events=len(self.events),
+                        final=self.final is not None)
+        header = json.dumps(metadata).encode('utf-8')
+        prefix = self.PREFIX.pack(self.MAGIC, self.VERSION, len(header))
+        events = b''.join(self.EVENT.pack(*event) for event in self.events)
+        return prefix + header + self.deal + events + (self.final or b'')
+
+    @classmethod
+    def decode(cls, data):
+        magic, version, header_size = cls.PREFIX.unpack_from(data)
+        if magic != cls.MAGIC:
+            raise ValueError('This is not a replay log.')
+        if version != cls.VERSION:
+            raise ValueError('Unsupported replay log version: {}'.format(
+                version))
+        offset = cls.PREFIX.size
+        metadata = json.loads(data[offset:offset + header_size].decode('utf-8'))
+        offset += header_size
+        deal = data[offset:offset + StateLog.RECORD_SIZE]
+        offset += StateLog.RECORD_SIZE
+        events = [cls.EVENT.unpack_from(data, offset + i * cls.EVENT.size) for
+                  i in range(metadata.pop('num_events'))]
+        offset += len(events) * cls.EVENT.size
+        final = data[offset:] if metadata.pop('final') else None
+        return cls(metadata, deal, events, final)
+
+    def export(self, file_path):
+        with open(file_path, 'wb') as file:
+            file.write(self.encode())
+
+    @classmethod
+    def load(cls, file_path):
+        with open(file_path, 'rb') as file:
+            return cls.decode(file.read())
+
+    def _to_input(self, event, game):
+        kind, first, second, _ = event
+        if kind == self.OFFENSE:
+            return OffenseDeckIndexInput(first)
+        elif kind == self.DEFENSE:
+            return DefenseDeckIndexInput(first)
+        elif kind == self.SHOUT:
+            shouts = []
+            for player, value in zip(game.players, (first, second)):
+                action = None if value == -1 else constants.Action(value)
+                shouts.append(Shout(player, action))
+            return ShoutInput(shouts)
+        raise ValueError('Invalid event.')
+
+    def game_class(self):
+        """the class of the recorded game, since their rules differ"""
+        name = self.metadata.get('game_class')
+        if name is None:
+            return Game
+        try:
+            return Game.named(name)
+        except ValueError:
+            for module_name in self.GAME_MODULES:
+                importlib.import_module(module_name)
+            return Game.named(name)
+
+    def __len__(self):
+        """the number of games replay yields"""
+        return len(self.events) + 1
+
+    def replay(self, player_red=None, player_black=None, game_class=None):
+        """yield the same game after the deal and after every event
+
+        game_class defaults to the class the game was recorded with.
+        """
+        if player_red is None:
+            player_red = Player(name=self.metadata['red']['name'])
+        if player_black is None:
+            player_black = Player(name=self.metadata['black']['name'])
+        if game_class is None:
+            game_class = self.game_class()
+        options = game_class.replay_options(self.metadata, player_red,
+                                            player_black)
+        state = CompactGameState.from_bytes(self.deal)
+        game = state.to_game(player_red, player_black, game_class,
+                             headless=True, **options)
+        yield game
+        events = iter(self.events)
+        while not game.is_over():
+            duel = game.to_next_duel()
+            while not duel.is_over():
+                event = next(events, None)
+                if event is None:
+                    return
+                game.prepare()
+                game.process(self._to_input(event, game))
+                if duel._state.value != event[-1]:
+                    raise ValueError('The replay diverged from the log.')
+                yield game
+
+    def state_at(self, step, game_class=None):
+        """the state after the given number of events"""
+        for index, game in enumerate(self.replay(game_class=game_class)):
+            if index == step:
+                return game.to_compact()
+        raise IndexError('There are only {} events.'.format(len(self.events)))
+
+    @classmethod
+    def read_final_state(cls, file_path, game_class=None):
+        """read the header and the final record without loading the rest"""
+        with open(file_path, 'rb') as file:
+            prefix = file.read(cls.PREFIX.size)
+            magic, version, header_size = cls.PREFIX.unpack(prefix)
+            if magic != cls.MAGIC or version != cls.VERSION:
+                raise ValueError('Unsupported replay log.')
+            metadata = json.loads(file.read(header_size).decode('utf-8'))
+            if metadata['final']:
+                file.seek(-StateLog.RECORD_SIZE, os.SEEK_END)
+                record = file.read(StateLog.RECORD_SIZE)
+                return metadata, CompactGameState.from_bytes(record)
+        log = cls.load(file_path)
+        return log.metadata, log.final_state(game_class)
+
+    def final_state(self, game_class=None):
+        if self.final is not None:
+            return CompactGameState.from_bytes(self.final)
+        return self.state_at(len(self.events), game_class)
+
+
+class Pacing(object):
+    """how long the waits between displays last
+
+    Every duration is divided by speed. With skip_without_humans, waits are
+    skipped altogether while no human is playing, since only humans need the
+    time to read.
+    """
+
+    def __init__(self, speed=1.0, skip_without_humans=False):
+        self.speed = speed
+        self.skip_without_humans = skip_without_humans
+        self.humans_playing = True
+
+    def seconds(self, duration, humans_playing=None):
+        if humans_playing is None:
+            humans_playing = self.humans_playing
+        if not duration or self.skip_without_humans and not humans_playing:
+            return 0
+        return duration / self.speed
+
+    def sleep(self, duration, humans_playing=None):
+        seconds = self.seconds(duration, humans_playing)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    @staticmethod
+    def speed_argument(text):
+        """argparse type of --speed, since waits are divided by it"""
+        speed = float(text)
+        if speed <= 0:
+            raise argparse.ArgumentTypeError(
+                'The speed must be positive, not {}.'.format(text))
+        return speed
+
+
+PACING = Pacing()  # shared by every display
+
+
+class OutputHandler(object):
+    def __init__(self, renderer=None):
         self.states = []
         self.messages = []
+        self.metadata = None
+        self.replay = None
+        self.renderer = renderer  # a TerminalRenderer, if any
+
+    def show(self, game=None, message='', duration=0):
+        """display through the renderer if there is one"""
+        if self.renderer is None:
+            game_state_in_json = None if game is None else game.to_json()
+            self.display(game_state_in_json, message, duration)
+        else:
+            self.renderer.render(game, message)
+            PACING.sleep(duration)
 
-    def save(self, game_state_in_json, message):
-        self.states.append(game_state_in_json)
+    def save(self, game, message):
+        if self.metadata is None:
+            self.metadata = StateLog.describe(game)
+        self.states.append(game.to_bytes())
         self.messages.append(message)
 
+    def start_replay(self, game):
+        self.replay = ReplayLog.start(game)
+        self.metadata = self.replay.metadata
+
+    def record(self, user_input, game):
+        self.replay.record(user_input, game)
+
     @staticmethod
     def display(game_state_in_json=None, message='', duration=0):
-        column_width = 9
+        OutputHandler.render(game_state_in_json, message)
+        PACING.sleep(duration)
+
+    @staticmethod
+    def render(game_state_in_json=None, message=''):
+        if game_state_in_json is None and message:
+            lines = [OutputHandler.divider()]
+        else:
+            game = jsonpickle.decode(game_state_in_json)
+            lines = OutputHandler.board_lines(game)
+        lines.extend(OutputHandler.message_lines(message))
+        print('\n'.join(lines))
+
+    COLUMN_WIDTH = 9
+
+    @staticmethod
+    def center(content, width, fill=''):
+        return '{:{}^{}}'.format(content, fill, width)
+
+    @staticmethod
+    def divider():
+        total_width = OutputHandler.COLUMN_WIDTH * constants.DECK_PER_PILE
+        return OutputHandler.center('', total_width, fill='-')
+
+    @staticmethod
+    def deck_cells(deck):
+        """number, undisclosed delegate and the three cards of a deck"""
+        number = ('< #{} >' if deck.is_in_duel() else '#{}').format(
+            deck.index + 1)
+        return (number, deck.show_undisclosed_delegate()) + \
+            deck.mask_if_undisclosed()
+
+    @staticmethod
+    def board_lines(game, deck_cells=None):
+        """the board as a list of lines, starting with the divider
+
+        deck_cells(side, deck) may supply the cells of a deck, for example
+        from a cache; side is 0 for the Player Red and 1 for the Player Black.
+        """
+        column_width = OutputHandler.COLUMN_WIDTH
         total_width = column_width * constants.DECK_PER_PILE
         name_format = '{} ({})'
         stats_format = 'Points {} | Die {}'
-
-        def center(content, width, fill=''):
-            return '{:{}^{}}'.format(content, fill, width)
+        center = OutputHandler.center
+        if deck_cells is None:
+            def deck_cells(side, deck):
+                return OutputHandler.deck_cells(deck)
 
         def to_line(iterable):
             aligned = (center(elem, column_width) for elem in iterable)
             return ''.join(aligned)
 
-        divider = center('', total_width, fill='-')
-        print(divider)
-        if game_state_in_json is None and message:
-            message_delimited = message.split('\n')
-            print('Message:  {}'.format(message_delimited[0]))
-            for line in message_delimited[1:]:
-                print('{}{}'.format(constants.INDENT, line))
-            time.sleep(duration)
-            return
-        game = jsonpickle.decode(game_state_in_json)
+        def first_line(player):
+            role = '' if duel is None else (
+                'Offense' if player == duel.offense else 'Defense')
+            name = name_format.format(player.name, player.alias)
+            stats = stats_format.format(player.points, player.num_shout_die)
+            return '{}{}{}'.format(center(role, column_width * 2),
+                                   center(name, column_width * 5),
+                                   center(stats, column_width * 2))
+
         duel = game.duel_ongoing
-        red_role = '' if duel is None else (
-            'Offense' if game.player_red == duel.offense else 'Defense')
-        red_name = name_format.format(game.player_red.name,
-                                      game.player_red.alias)
-        red_stats = stats_format.format(game.player_red.points,
-                                        game.player_red.num_shout_die)
-        red_role_aligned = center(red_role, column_width * 2)
-        red_name_aligned = center(red_name, column_width * 5)
-        red_stats_aligned = center(red_stats, column_width * 2)
-        red_first_line = '{}{}{}'.format(red_role_aligned, red_name_aligned,
-                                         red_stats_aligned)
-        print(red_first_line)
-        red_decks = game.player_red.decks
-        red_numbers = (('< #{} >' if deck.is_in_duel() else '#{}').format(
-            deck.index + 1) for deck in red_decks)
-        red_number_line = to_line(red_numbers)
-        print(red_number_line)
-        red_undisclosed_delegates = (deck.show_undisclosed_delegate() for deck
-                                     in red_decks)
-        row_undisclosed_delegate_line = to_line(red_undisclosed_delegates)
-        print(row_undisclosed_delegate_line)
-        red_opened_delegates = (deck.mask_if_undisclosed()[0] for deck in
-                                red_decks)
-        row_opened_delegates_line = to_line(red_opened_delegates)
-        print(row_opened_delegates_line)
-        red_seconds = (deck.mask_if_undisclosed()[1] for deck in red_decks)
-        row_seconds_line = to_line(red_seconds)
-        print(row_seconds_line)
-        red_lasts = (deck.mask_if_undisclosed()[2] for deck in red_decks)
-        red_lasts_line = to_line(red_lasts)
-        print(red_lasts_line)
-        print()
+        red_cells = [deck_cells(0, deck) for deck in game.player_red.decks]
+        black_cells = [deck_cells(1, deck) for deck in
+                       game.player_black.decks]
+        lines = [OutputHandler.divider(), first_line(game.player_red)]
+        # number, undisclosed delegate, opened delegate, second, last
+        lines.extend(to_line(cells[row] for cells in red_cells) for row in
+                     range(5))
+        lines.append('')
         duel_str = '' if duel is None else '[Duel #{}]'.format(duel.index + 1)
-        duel_line = center(duel_str, total_width)
-        print(duel_line)
-        print()
-        black_decks = game.player_black.decks
-        black_lasts = (deck.mask_if_undisclosed()[2] for deck in black_decks)
-        print(to_line(black_lasts))
-        black_seconds = (deck.mask_if_undisclosed()[1] for deck in black_decks)
-        print(to_line(black_seconds))
-        black_opened_delegates = (deck.mask_if_undisclosed()[0] for deck in
-                                  black_decks)
-        print(to_line(black_opened_delegates))
-        black_undisclosed_delegates = (deck.show_undisclosed_delegate() for deck
-                                       in black_decks)
-        black_undisclosed_delegates_line = to_line(black_undisclosed_delegates)
-        print(black_undisclosed_delegates_line)
-        black_numbers = (
-            ('< #{} >' if deck.is_in_duel() else '#{}').format(
-                deck.index + 1) for deck in black_decks)
-        black_number_line = to_line(black_numbers)
-        print(black_number_line)
-        black_role = '' if duel is None else (
-            'Offense' if game.player_black == duel.offense else 'Defense')
-        black_name = name_format.format(game.player_black.name,
-                                        game.player_black.alias)
-        black_stats = stats_format.format(game.player_black.points,
-                                          game.player_black.num_shout_die)
-        black_role_aligned = center(black_role, column_width * 2)
-        black_name_aligned = center(black_name, column_width * 5)
-        black_stats_aligned = center(black_stats, column_width * 2)
-        black_first_line = '{}{}{}'.format(black_role_aligned,
-                                           black_name_aligned,
-                                           black_stats_aligned)
-        print(black_first_line)
-        if message:
-            message_delimited = message.split('\n')
-            print('Message:  {}'.format(message_delimited[0]))
-            for line in message_delimited[1:]:
-                print('{}{}'.format(constants.INDENT, line))
-        time.sleep(duration)
+        lines.append(center(duel_str, total_width))
+        lines.append('')
+        lines.extend(to_line(cells[row] for cells in black_cells) for row in
+                     reversed(range(5)))
+        lines.append(first_line(game.player_black))
+        return lines
 
     @staticmethod
-    def extract_file_name(game_state_in_json):
-        game = jsonpickle.decode(game_state_in_json)
-        red_class = game.player_red.__class__.__name__
-        red_name = game.player_red.name
-        black_class = game.player_black.__class__.__name__
-        black_name = game.player_black.name
-        time_started_str = game.time_started
+    def message_lines(message):
+        if not message:
+            return []
+        message_delimited = message.split('\n')
+        lines = ['Message:  {}'.format(message_delimited[0])]
+        lines.extend('{}{}'.format(constants.INDENT, line) for line in
+                     message_delimited[1:])
+        return lines
+
+    @staticmethod
+    def extract_file_name(metadata, extension=StateLog.EXTENSION):
+        red_class = metadata['red']['class']
+        red_name = metadata['red']['name']
+        black_class = metadata['black']['class']
+        black_name = metadata['black']['name']
+        time_started_str = metadata['time_started']
         time_started_float = float(time_started_str)
         datetime_started = datetime.datetime.fromtimestamp(time_started_float)
         datetime_str = datetime.datetime.strftime(datetime_started,
                                                   '%Y%m%d%H%M%S')
-        file_name = '{}({}){}({}){}.json'.format(red_class, red_name,
-                                                 black_class, black_name,
-                                                 datetime_str)
+        file_name = '{}({}){}({}){}{}'.format(red_class, red_name,
+                                              black_class, black_name,
+                                              datetime_str, extension)
         return file_name
 
     @staticmethod
@@ -1854,32 +2711,113 @@ class OutputHandler(object):
             else:
                 json.dump(game_state_json, file)
 
+    @staticmethod
+    def default_file_location():
+        current_file_path = os.path.abspath(__file__)
+        current_directory_path = os.path.dirname(current_file_path)
+        directory_name = 'json'
+        file_location = os.path.join(current_directory_path, directory_name)
+        if not os.path.exists(file_location):
+            os.makedirs(file_location)
+        return file_location
+
     def export_game_states(self, file_location=None, file_name=None,
                            final_state_only=False):
         if not self.states:
             raise Exception('No game states found in this OutputHandler.')
         if file_location is None:
-            current_file_path = os.path.abspath(__file__)
-            current_directory_path = os.path.dirname(current_file_path)
-            directory_name = 'json'
-            file_location = os.path.join(current_directory_path, directory_name)
-            if not os.path.exists(file_location):
-                os.makedirs(file_location)
+            file_location = self.default_file_location()
+        if file_name is None:
+            file_name = self.extract_file_name(self.metadata)
+        file_path = os.path.join(file_location, file_name)
+        records = self.states[-1:] if final_state_only else self.states
+        StateLog(self.metadata, list(records)).export(file_path)
+
+    def export_replay(self, file_location=None, file_name=None):
+        if self.replay is None:
+            raise Exception('No replay found in this OutputHandler.')
+        if file_location is None:
+            file_location = self.default_file_location()
         if file_name is None:
-            last_game_state = self.states[-1]
-            file_name = self.extract_file_name(last_game_state)
+            file_name = self.extract_file_name(self.metadata,
+                                               ReplayLog.EXTENSION)
         file_path = os.path.join(file_location, file_name)
-        self.export_json_to_file(self.states, file_path, final_state_only)
+        self.replay.export(file_path)
 
     def import_from_json(self, file_path):
         with open(file_path) as file:
             content = file.read()
             self.states = jsonpickle.decode(content)
 
+    def import_state_log(self, file_path):
+        log = StateLog.load(file_path)
+        self.metadata = log.metadata
+        self.states = log.records
+
+
+class TerminalRenderer(object):
+    """redraw only the rows of the board that changed
+
+    Renders the live game, or a CompactGameState along with its players,
+    without a jsonpickle round trip. The cells of every deck are cached until
+    its state or cards change, and only the rows that differ from the
+    previous frame are rewritten, using ANSI cursor movement.
+    """
+    CLEAR_SCREEN = '\x1b[2J'
+    CLEAR_LINE = '\x1b[K'
+    MOVE_TO = '\x1b[{};1H'
+
+    def __init__(self, stream=None):
+        self.stream = sys.stdout if stream is None else stream
+        self.lines = None  # the frame on the screen
+        self.board = None  # the board of the last game rendered
+        self._cells = {}
+
+    def _deck_cells(self, side, deck):
+        signature = deck._state, tuple((card.open_, card._value) for card in
+                                       deck.cards)
+        cached = self._cells.get((side, deck.index))
+        if cached is None or cached[0] != signature:
+            cached = signature, OutputHandler.deck_cells(deck)
+            self._cells[side, deck.index] = cached
+        return cached[1]
+
+    def render(self, game=None, message=''):
+        """draw game, or keep the last board and update only the message"""
+        if game is not None:
+            self.board = OutputHandler.board_lines(game, self._deck_cells)
+        elif self.board is None:
+            self.board = [OutputHandler.divider()]
+        lines = self.board + OutputHandler.message_lines(message)
+        self.stream.write(self.diff(lines))
+        self.stream.flush()
+
+    def render_state(self, state, player_red, player_black, message=''):
+        self.render(state.to_game(player_red, player_black), message)
+
+    def diff(self, lines):
+        """the escape sequences that turn the last frame into lines"""
+        previous = [] if self.lines is None else self.lines
+        parts = [self.CLEAR_SCREEN] if self.lines is None else []
+        for row, line in enumerate(lines):
+            if row >= len(previous) or previous[row] != line:
+                parts.append(self.MOVE_TO.format(row + 1) + line +
+                             self.CLEAR_LINE)
+        for row in range(len(lines), len(previous)):
+            parts.append(self.MOVE_TO.format(row + 1) + self.CLEAR_LINE)
+        # leave the cursor below the frame for prompts
+        parts.append(self.MOVE_TO.format(len(lines) + 1))
+        self.lines = lines
+        return ''.join(parts)
+
+    def reset(self):
+        """forget the screen, so that the next frame is drawn in full"""
+        self.lines = None
+
 
 def main(num_human_players=1, suppress_output=False, save_all=False,
-         save_result=False):
-    output_handler = OutputHandler()
+         save_result=False, live=False):
+    output_handler = OutputHandler(TerminalRenderer() if live else None)
 
     if num_human_players == 2:
         player1 = HumanPlayer('Player 1, enter your name: ')
@@ -1892,6 +2830,7 @@ def main(num_human_players=1, suppress_output=False, save_all=False,
         player2 = ComputerPlayer(player1.name)
     else:
         raise Exception('Invalid number of human players')
+    PACING.humans_playing = num_human_players > 0
 
     # red/black decision
     if not suppress_output:
@@ -1899,7 +2838,7 @@ def main(num_human_players=1, suppress_output=False, save_all=False,
             player1.name, player2.name)
         message += '\nLet\'s flip a coin to decide who will be the Player Red!'
         duration = constants.Duration.BEFORE_COIN_TOSS
-        output_handler.display(message=message, duration=duration)
+        output_handler.show(message=message, duration=duration)
 
     player_red, player_black = RandomPlayerOrder(player1, player2).players
     # player_red, player_black = player1, player2
@@ -1909,7 +2848,7 @@ def main(num_human_players=1, suppress_output=False, save_all=False,
             player_red.name)
         message += '\n{}, you are the Player Black.'.format(player_black.name)
         duration = constants.Duration.AFTER_COIN_TOSS
-        output_handler.display(message=message, duration=duration)
+        output_handler.show(message=message, duration=duration)
 
     game = Game(player_red, player_black)
     game.distribute_piles()
@@ -1918,28 +2857,66 @@ def main(num_human_players=1, suppress_output=False, save_all=False,
     if not suppress_output:
         message = "Let's start DieOrDare!\nHere we go!"
         duration = constants.Duration.BEFORE_GAME_START
-        output_handler.display(message=message, duration=duration)
+        output_handler.show(message=message, duration=duration)
 
+    if save_all:
+        output_handler.start_replay(game)
     while not game.is_over():
         duel = game.to_next_duel()
         while not duel.is_over():
             message, duration = game.prepare()
-            if save_all or save_result:
-                output_handler.save(game.to_json(), message)
             if not suppress_output:
-                output_handler.display(game.to_json(), message, duration)
+                output_handler.show(game, message, duration)
             user_input = game.accept()
             message, duration = game.process(user_input)
-            if save_all or save_result:
-                output_handler.save(game.to_json(), message)
+            if save_all:
+                output_handler.record(user_input, game)
             if not suppress_output:
-                output_handler.display(game.to_json(), message, duration)
+                output_handler.show(game, message, duration)
     if save_all:
-        output_handler.export_game_states(final_state_only=False)
+        output_handler.export_replay()
     elif save_result:
+        output_handler.save(game, message)
         output_handler.export_game_states(final_state_only=True)
 
 
+GameRecord = collections.namedtuple('GameRecord', (
+    'red_won', 'result', 'duel_index', 'points_red', 'points_black',
+    'num_shout_die_red', 'num_shout_die_black'))
+
+
+def simulate(n_games, red_factory=ComputerPlayer, black_factory=ComputerPlayer,
+             seed=None):
+    """play computer-vs-computer games without any output
+
+    Messages, timestamps and game states are never built, and the two players
+    are created once and reset between games. Every random choice comes from
+    one random.Random(seed), so a seed gives the same records in any process.
+    Returns one GameRecord per game.
+    """
+    rng = random.Random(seed)
+    player_red = red_factory()
+    player_black = black_factory()
+    records = []
+    for _ in range(n_games):
+        for player in (player_red, player_black):
+            player.reset()
+        game = Game(player_red, player_black, headless=True, rng=rng)
+        game.distribute_piles()
+        game.build_decks()
+        while not game.is_over():
+            duel = game.to_next_duel()
+            while not duel.is_over():
+                game.prepare()
+                game.process(game.accept())
+        record = GameRecord(int(game.winner == player_red), game.result.value,
+                            game.duel_index, player_red.points,
+                            player_black.points, player_red.num_shout_die,
+                            player_black.num_shout_die)
+        records.append(record)
+    return records
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Enjoy my game!')
     parser.add_argument('--humans', help='number of human players',
@@ -1950,12 +2927,27 @@ if __name__ == '__main__':
                         type=int, default=1)  # silently ignores negative inputs
     group = parser.add_mutually_exclusive_group()
     group.add_argument('--save-all', action='store_true',
-                       help='save all command-line output to a JSON file')
+                       help='save a replay of the whole game')
     group.add_argument('--save-result-only', action='store_true',
-                       help='save only the result to a JSON file')
+                       help='save only the result to a binary state log')
+    parser.add_argument('--live', action='store_true',
+                        help='redraw only the changed rows of the board')
+    parser.add_argument('--speed', type=Pacing.speed_argument, default=1.0,
+                        help='divide every wait between displays by this')
+    parser.add_argument('--fast', action='store_true',
+                        help='skip the waits when no human is playing')
     arguments = parser.parse_args()
+    PACING.speed = arguments.speed
+    PACING.skip_without_humans = arguments.fast
+    save = arguments.save_all or arguments.save_result_only
+    if arguments.humans == 0 and arguments.quiet and not save:
+        records = simulate(arguments.repeat)
+        num_red_won = sum(record.red_won for record in records)
+        print('Player Red won {} of {} games.'.format(num_red_won,
+                                                      len(records)))
+        parser.exit()
     for trial_index in range(arguments.repeat):
         if arguments.repeat > 1:
             print('Game #{}'.format(trial_index + 1))
         main(arguments.humans, arguments.quiet, arguments.save_all,
-             arguments.save_result_only)
+             arguments.save_result_only, arguments.live)
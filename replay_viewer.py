@@ -0,0 +1,130 @@
+import argparse
+import constants
+import die_or_dare
+import json
+import jsonpickle
+
+
+class ReplayViewer(object):
+    """step through a saved game (.json, .dod or .dor) and seek anywhere
+
+    Frames are decoded only when shown, and a .dor log is replayed only as
+    far as the frames seen so far, with the rules of the game class it was
+    recorded with. Autoplay waits go through die_or_dare.PACING, so its
+    speed applies here as well.
+    """
+    COMMANDS = ('[Enter] next  p: previous  g N: go to frame N  '
+                'a: play to the end  +/-: faster/slower  q: quit')
+
+    def __init__(self, file_path, renderer=None):
+        self.file_path = file_path
+        self.renderer = die_or_dare.TerminalRenderer() if renderer is None \
+            else renderer
+        self.position = 0
+        self.players = None
+        self._replay = None  # the rest of a .dor log, replayed on demand
+        if file_path.endswith('.json'):
+            with open(file_path) as file:
+                self.frames = json.load(file)  # jsonpickle game states
+            self._decode = jsonpickle.decode
+        elif file_path.endswith(die_or_dare.ReplayLog.EXTENSION):
+            log = die_or_dare.ReplayLog.load(file_path)
+            self.frames = []
+            self._length = len(log)
+            self._replay = log.replay()
+            self._set_players(log.metadata)
+            self._decode = self._from_bytes
+        else:
+            log = die_or_dare.StateLog.load(file_path)
+            self.frames = log.records
+            self._set_players(log.metadata)
+            self._decode = self._from_bytes
+
+    def __len__(self):
+        if self._replay is None:
+            return len(self.frames)
+        return self._length
+
+    def _set_players(self, metadata):
+        self.players = (die_or_dare.Player(name=metadata['red']['name']),
+                        die_or_dare.Player(name=metadata['black']['name']))
+
+    def _from_bytes(self, record):
+        state = die_or_dare.CompactGameState.from_bytes(record)
+        return state.to_game(*self.players, headless=True)
+
+    def game_at(self, index):
+        while len(self.frames) <= index:
+            game = next(self._replay, None)
+            if game is None:  # the log ended early
+                self._length = len(self.frames)
+                index = len(self.frames) - 1
+                break
+            self.frames.append(game.to_bytes())
+        return self._decode(self.frames[index])
+
+    def seek(self, index):
+        """show the frame at index, clamped to the saved frames"""
+        self.position = max(0, min(index, len(self) - 1))
+        game = self.game_at(self.position)
+        self.position = min(self.position, len(self) - 1)
+        message = 'Frame {}/{} of {}'.format(self.position + 1, len(self),
+                                             self.file_path)
+        self.renderer.render(game, message)
+
+    def step(self, delta=1):
+        self.seek(self.position + delta)
+
+    def play(self, delay=constants.Duration.BEFORE_DECK_CHOICE, end=None):
+        """show every frame from the current one until end"""
+        end = len(self) if end is None else min(end, len(self))
+        for index in range(self.position, end):
+            self.seek(index)
+            die_or_dare.PACING.sleep(delay, humans_playing=True)
+
+    def run(self):
+        """read commands from the keyboard until q"""
+        self.seek(self.position)
+        while True:
+            command = input(self.COMMANDS + '\n> ').strip()
+            self.renderer.reset()  # the prompt scrolled the screen
+            if command == 'q':
+                break
+            elif command == '':
+                self.step(1)
+            elif command == 'p':
+                self.step(-1)
+            elif command.startswith('g'):
+                try:
+                    self.seek(int(command[1:]) - 1)
+                except ValueError:
+                    self.seek(self.position)
+            elif command == 'a':
+                self.play()
+            elif command in ('+', '-'):
+                factor = 2 if command == '+' else 0.5
+                die_or_dare.PACING.speed *= factor
+                self.seek(self.position)
+            else:
+                self.seek(self.position)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Watch a saved game.')
+    parser.add_argument('file', help='a saved .json, .dod or .dor game')
+    parser.add_argument('--speed', type=die_or_dare.Pacing.speed_argument,
+                        default=1.0,
+                        help='divide the wait between frames by this')
+    parser.add_argument('--start', type=int, default=1,
+                        help='frame to start from')
+    parser.add_argument('-a', '--autoplay', action='store_true',
+                        help='play to the end instead of waiting for keys')
+    arguments = parser.parse_args()
+    die_or_dare.PACING.speed = arguments.speed
+    viewer = ReplayViewer(arguments.file)
+    viewer.position = max(0, arguments.start - 1)
+    if arguments.autoplay:
+        viewer.play()
+    else:
+        viewer.run()
+    print('Done!')
@@ -1,6 +1,60 @@
 from die_or_dare import *
-import keras
-import tensorflow
+
+
+class NumpyMLP(object):
+    """play-only stand-in for the Keras model of ReinforcementLearningAgent
+
+    Runs the dense/ReLU stack (352-352-352-23) with NumPy, with a ReLU after
+    every dense layer but the last, so that playing against a trained agent
+    does not need Keras or TensorFlow. The weights come in the order of
+    keras.Model.get_weights: kernel and bias of every dense layer.
+    """
+
+    def __init__(self, weights):
+        self.set_weights(weights)
+
+    @classmethod
+    def from_h5(cls, file_path):
+        """load the weights a Keras model saved with save_weights"""
+        import h5py
+        with h5py.File(file_path, 'r') as file:
+            group = file['model_weights'] if 'model_weights' in file else file
+            weights = []
+            for layer_name in group.attrs['layer_names']:
+                layer = group[cls._decode(layer_name)]
+                for weight_name in layer.attrs['weight_names']:
+                    weights.append(numpy.array(layer[cls._decode(
+                        weight_name)]))
+        return cls(weights)
+
+    @staticmethod
+    def _decode(name):
+        return name.decode('utf8') if isinstance(name, bytes) else name
+
+    @property
+    def output_shape(self):
+        return None, self.kernels[-1].shape[1]
+
+    def get_weights(self):
+        weights = []
+        for kernel, bias in zip(self.kernels, self.biases):
+            weights.extend([kernel, bias])
+        return weights
+
+    def set_weights(self, weights):
+        self.kernels = [numpy.asarray(kernel, dtype=numpy.float32) for
+                        kernel in weights[0::2]]
+        self.biases = [numpy.asarray(bias, dtype=numpy.float32) for bias in
+                       weights[1::2]]
+
+    def predict(self, x):
+        output = numpy.asarray(x, dtype=numpy.float32)
+        last = len(self.kernels) - 1
+        for i, (kernel, bias) in enumerate(zip(self.kernels, self.biases)):
+            output = numpy.dot(output, kernel) + bias
+            if i < last:
+                numpy.maximum(output, 0, out=output)
+        return output
 
 
 class ReinforcementLearningAgent(ComputerPlayer):
@@ -34,9 +88,33 @@ class ReinforcementLearningAgent(ComputerPlayer):
     }
 
     def __init__(self, name=None, initial_epsilon=0.0, weights_file_name=None,
-                 architecture_file_name=None, *args, **kwargs):
+                 architecture_file_name=None, play_only=False, model=None,
+                 *args, **kwargs):
+        """play_only loads weights_file_name into a NumpyMLP so that Keras is
+        never imported, and model replaces the default Keras model"""
         super().__init__(*args, **kwargs)
         self.name = 'Smarty' if name is None else name
+        self.epsilon = None
+        self.initial_epsilon = initial_epsilon
+        self.epsilon_multiplier = None
+        self.total_reward = None
+        self.intelligence = None
+        self.q_values = None  # set by VectorizedDoDEnv for the next decision
+        self.numpy_rng = None  # samples the replay memory, if a RandomState
+        self.target_model = None
+        self.epochs_to_threshold = None
+        self.weights_file_name = weights_file_name
+        self.architecture_file_name = architecture_file_name
+        if model is not None:
+            self.model = model
+            return
+        if play_only:
+            if weights_file_name is None or \
+                    not os.path.exists(weights_file_name):
+                raise ValueError('A play-only agent needs a weights file.')
+            self.model = NumpyMLP.from_h5(weights_file_name)
+            return
+        import keras
         model = None
         if architecture_file_name is None:
             try:
@@ -58,28 +136,51 @@ class ReinforcementLearningAgent(ComputerPlayer):
             model.add(keras.layers.core.Dense(num_choices))
         model.compile(optimizer='adam', loss='mse')
         self.model = model
-        self.epsilon = None
-        self.initial_epsilon = initial_epsilon
-        self.epsilon_multiplier = None
-        self.total_reward = None
-        self.intelligence = None
-        self.weights_file_name = weights_file_name
         # open model weights and architecture if available
         if weights_file_name is not None:
             if os.path.exists(weights_file_name):  # .h5
                 self.model.load_weights(weights_file_name)
-        self.architecture_file_name = architecture_file_name
 
-    def reset_rl_data(self):
+    def reset_rl_data(self, max_memory=50, keep_memory=False, discount=1.0):
         self.total_reward = 0
-        self.intelligence = ArtificialIntelligence(self.model)
+        if not keep_memory or self.intelligence is None:
+            self.intelligence = ArtificialIntelligence(
+                self.model, max_memory, discount,
+                target_model=self.target_model, rng=self.numpy_rng)
+
+    def sync_target_model(self):
+        """copy the weights of the model into the target network"""
+        if self.target_model is None:
+            import keras
+            self.target_model = keras.models.clone_model(self.model)
+            if self.intelligence is not None:
+                self.intelligence.target_model = self.target_model
+        self.target_model.set_weights(self.model.get_weights())
 
     def train(self, opponent, n_epoch=100, data_size=50, epsilon_multiplier=1.0,
               save_result=False, suppress_output=False, save_all=True,
               weights_file_name='new.h5',
-              architecture_file_name='new.json'):
+              architecture_file_name='new.json', results_store=None,
+              fit_every=1, epochs=8, batch_size=16, evaluate_every=1,
+              max_memory=50, keep_memory=False, discount=1.0,
+              target_sync_every=None, win_rate_threshold=None,
+              win_rate_window=100):
+        """play n_epoch games against opponent, learning along the way
+
+        The model is fit every fit_every steps, or once at the end of every
+        game if fit_every is None. The loss is evaluated every evaluate_every
+        fits, or never if evaluate_every is None. With keep_memory, the
+        replay memory of up to max_memory steps outlives each game.
+
+        Targets are discounted by discount. If target_sync_every is set, they
+        come from a target network that is synced every target_sync_every
+        fits. If win_rate_threshold is set, the first epoch at which the win
+        rate over the last win_rate_window games reaches it is printed and
+        kept in epochs_to_threshold.
+        """
 
         train_start = datetime.datetime.now()
+        PACING.humans_playing = isinstance(opponent, HumanPlayer)
 
         # initialize history
         win_history = []  # history of win/lose game
@@ -87,6 +188,10 @@ class ReinforcementLearningAgent(ComputerPlayer):
         win_rate = 0.0
         epoch = None
         self.epsilon = self.initial_epsilon
+        self.epochs_to_threshold = None
+        if target_sync_every is not None:
+            self.sync_target_model()
+        n_fits = 0
         # epoch for loop
         for epoch in range(n_epoch):
             game_start = time.time()
@@ -96,7 +201,7 @@ class ReinforcementLearningAgent(ComputerPlayer):
             # restart game
             for player in [self, opponent]:
                 if isinstance(player, ReinforcementLearningAgent):
-                    player.reset_rl_data()
+                    player.reset_rl_data(max_memory, keep_memory, discount)
                 player.reset()
             intelligence = self.intelligence
 
@@ -108,7 +213,8 @@ class ReinforcementLearningAgent(ComputerPlayer):
                 duration = constants.Duration.BEFORE_COIN_TOSS
                 output_handler.display(message=message, duration=duration)
 
-            player_red, player_black = RandomPlayerOrder(self, opponent).players
+            player_red, player_black = RandomPlayerOrder(self, opponent,
+                                                         self.rng).players
             if not suppress_output:
                 message = '{}, you are the Player Red, so you will go first.'.format(
                     player_red.name)
@@ -117,7 +223,7 @@ class ReinforcementLearningAgent(ComputerPlayer):
                 duration = constants.Duration.AFTER_COIN_TOSS
                 output_handler.display(message=message, duration=duration)
 
-            game = DoDGameRL(player_red, player_black)
+            game = DoDGameRL(player_red, player_black, self.rng)
             game.distribute_piles()
             game.build_decks()
 
@@ -131,12 +237,12 @@ class ReinforcementLearningAgent(ComputerPlayer):
             envstate = game.observe(by_red)
 
             n_episodes = 0
+            if save_all:
+                output_handler.start_replay(game)
             while not game.is_over():
                 duel = game.to_next_duel()
                 while not duel.is_over():
                     message, duration = game.prepare()
-                    if save_all or save_result:
-                        output_handler.save(game.to_json(), message)
                     if not suppress_output:
                         output_handler.display(game.to_json(), message,
                                                duration)
@@ -148,8 +254,8 @@ class ReinforcementLearningAgent(ComputerPlayer):
                     user_input = game.accept(prev_envstate)
                     # Apply action, get reward and new envstate
                     message, duration = game.process(user_input)
-                    if save_all or save_result:
-                        output_handler.save(game.to_json(), message)
+                    if save_all:
+                        output_handler.record(user_input, game)
                     if not suppress_output:
                         output_handler.display(game.to_json(), message,
                                                duration)
@@ -158,30 +264,33 @@ class ReinforcementLearningAgent(ComputerPlayer):
                     reward = reward_after - reward_before
 
                     # Store episode (experience)
-                    if isinstance(user_input, OffenseDeckIndexInput):
-                        choice = user_input.value
-                    elif isinstance(user_input, DefenseDeckIndexInput):
-                        choice = constants.DECK_PER_PILE + user_input.value
-                    else:
-                        choice = 2 * constants.DECK_PER_PILE + self.recent_action.value
+                    choice = self.choice_index(user_input)
                     episode = [prev_envstate, choice, reward, envstate,
                                game.is_over()]
                     intelligence.memorize(episode)
                     n_episodes += 1
 
                     # Train neural network model
-                    inputs, targets = intelligence.get_data(data_size=data_size)
-                    self.model.fit(inputs, targets, epochs=8, batch_size=16,
-                                   verbose=0)
-                    loss = self.model.evaluate(inputs, targets, verbose=0)
+                    if self._every(n_episodes, fit_every):
+                        n_fits += 1
+                        loss = self.fit(
+                            data_size, epochs, batch_size,
+                            self._every(n_fits, evaluate_every), loss,
+                            self._every(n_fits, target_sync_every))
+            if fit_every is None:
+                n_fits += 1
+                loss = self.fit(data_size, epochs, batch_size,
+                                self._every(n_fits, evaluate_every), loss,
+                                self._every(n_fits, target_sync_every))
             if game.winner == self:
                 win_history.append(1)
             else:
                 win_history.append(0)
             game_time = time.time() - game_start
             if save_all:
-                output_handler.export_game_states(final_state_only=False)
+                output_handler.export_replay()
             elif save_result:
+                output_handler.save(game, message)
                 output_handler.export_game_states(final_state_only=True)
 
             # record epoch
@@ -199,17 +308,91 @@ class ReinforcementLearningAgent(ComputerPlayer):
                 game.duel_index + 1, game_time,
                 1 if self.alias == constants.PLAYER_RED else 2)
             print(','.join(str(elem) for elem in columns))
+            if results_store is not None:
+                results_store.append(columns)
+            if win_rate_threshold is not None and \
+                    self.epochs_to_threshold is None and \
+                    len(win_history) >= win_rate_window:
+                win_rate = sum(win_history[-win_rate_window:]) / win_rate_window
+                if win_rate >= win_rate_threshold:
+                    self.epochs_to_threshold = epoch + 1
+                    print('Reached {:.0%} win rate at epoch {}'.format(
+                        win_rate, epoch + 1))
             # if sum(win_history[-hsize:]) == hsize:
             #     print("Reached 100%% win rate at epoch: %d" % (epoch,))
             #     break
             # elif win_rate > 0.9:
             #     self.epsilon = 0.05
 
+        if results_store is not None:
+            results_store.flush()
         # Save model weights and architecture
         self.model.save_weights(weights_file_name)
         with open(architecture_file_name, 'w') as outfile:
             json.dump(self.model.to_json(), outfile)
 
+    def _q_values(self, prev_envstate):
+        if self.q_values is not None:
+            return self.q_values
+        return self.intelligence.predict(prev_envstate)
+
+    def choice_index(self, user_input):
+        """the output of the model that corresponds to user_input"""
+        if isinstance(user_input, OffenseDeckIndexInput):
+            return user_input.value
+        elif isinstance(user_input, DefenseDeckIndexInput):
+            return constants.DECK_PER_PILE + user_input.value
+        else:
+            return 2 * constants.DECK_PER_PILE + self.recent_action.value
+
+    def collect_experience(self, opponent):
+        """play a quiet game against opponent and return its episodes"""
+        self.total_reward = 0
+        for player in [self, opponent]:
+            player.reset()
+        player_red, player_black = RandomPlayerOrder(self, opponent,
+                                                     self.rng).players
+        game = DoDGameRL(player_red, player_black, self.rng)
+        game.distribute_piles()
+        game.build_decks()
+        by_red = self == game.player_red
+        envstate = game.observe(by_red)
+        episodes = []
+        while not game.is_over():
+            duel = game.to_next_duel()
+            while not duel.is_over():
+                game.prepare()
+                prev_envstate = envstate
+                reward_before = self.total_reward
+                user_input = game.accept(prev_envstate)
+                game.process(user_input)
+                envstate = game.observe(by_red=by_red)
+                reward = self.total_reward - reward_before
+                episode = [prev_envstate, self.choice_index(user_input),
+                           reward, envstate, game.is_over()]
+                episodes.append(episode)
+        return episodes, game
+
+    @staticmethod
+    def _every(count, interval):
+        return interval is not None and count % interval == 0
+
+    def fit(self, data_size, epochs, batch_size, evaluate=True, loss=0.0,
+            sync_target=False):
+        """fit the model on a sample of the memory and return the loss
+
+        The loss passed in is returned as is when evaluate is False.
+        """
+        inputs, targets = self.intelligence.get_data(data_size=data_size)
+        self.model.fit(inputs, targets, epochs=epochs, batch_size=batch_size,
+                       verbose=0)
+        self.intelligence.forget_predictions()
+        if evaluate:
+            loss = self.model.evaluate(inputs, targets, verbose=0)
+        if sync_target:
+            self.sync_target_model()
+        return loss
+
     def decide_offense_deck_index(self, decks_opponent, points_opponent,
                                   num_shout_die_opponent, prev_envstate=None):
         undisclosed_values = ComputerPlayer.undisclosed_values(self.decks)
@@ -221,13 +404,13 @@ class ReinforcementLearningAgent(ComputerPlayer):
                                         in self.decks}
             if undisclosed_value in delegate_values_to_index:
                 return delegate_values_to_index.get(undisclosed_value)
-        elif numpy.random.rand() > self.epsilon:
-            deck_index = numpy.argmax(self.intelligence.predict(prev_envstate))
+        elif self.rng.random() > self.epsilon:
+            deck_index = numpy.argmax(self._q_values(prev_envstate))
             if deck_index in range(constants.DECK_PER_PILE):
                 deck = self.decks[deck_index]
                 if deck.is_undisclosed():
                     return deck_index
-        deck = AnyOffenseDeck.apply(self.decks)
+        deck = AnyOffenseDeck.apply(self.decks, rng=self.rng)
         return deck.index
 
     def decide_defense_deck_index(self, decks_opponent, points_opponent,
@@ -245,14 +428,14 @@ class ReinforcementLearningAgent(ComputerPlayer):
                               deck.delegate_value != undisclosed_value]
                 deck = SmallestDefenseDeck.apply(candidates)
                 return deck.index
-        elif numpy.random.rand() > self.epsilon:
-            deck_index = numpy.argmax(self.intelligence.predict(prev_envstate))
+        elif self.rng.random() > self.epsilon:
+            deck_index = numpy.argmax(self._q_values(prev_envstate))
             deck_index -= constants.DECK_PER_PILE
             if deck_index in range(constants.DECK_PER_PILE):
                 deck = decks_opponent[deck_index]
                 if deck.is_undisclosed():
                     return deck_index
-        deck = AnyDefenseDeck.apply(decks_opponent)
+        deck = AnyDefenseDeck.apply(decks_opponent, rng=self.rng)
         return deck.index
 
     def shout(self, decks_opponent, points_opponent, num_shout_die_opponent,
@@ -280,12 +463,12 @@ class ReinforcementLearningAgent(ComputerPlayer):
             if constants.Action.DIE in valid_actions:
                 action = constants.Action.DIE
                 return Shout(self, action)
-        action_index = numpy.argmax(self.intelligence.predict(prev_envstate))
+        action_index = numpy.argmax(self._q_values(prev_envstate))
         action_index -= 2 * constants.DECK_PER_PILE
         if action_index in range(len(constants.Action)):
             action = constants.Action(action_index)
         else:
-            action = random.choice(valid_actions)
+            action = self.rng.choice(valid_actions)
         return Shout(self, action)
 
 
@@ -326,49 +509,275 @@ class ReinforcementLearningGame(abc.ABC):
     #     pass
 
 
+class ReplayMemory(object):
+    """fixed-capacity ring buffer of transitions in preallocated arrays
+
+    The arrays are allocated on the first insertion, once the observation
+    size is known. When full, the oldest transition is overwritten. With
+    prioritized sampling, transitions are drawn in proportion to their
+    priority raised to alpha, and new ones get the highest priority so far.
+    Samples come from rng, a numpy.random.RandomState, or from the global
+    NumPy generator if it is None.
+    """
+
+    def __init__(self, capacity, state_dtype=numpy.int8, prioritized=False,
+                 alpha=0.6, rng=None):
+        self.capacity = capacity
+        self.rng = numpy.random if rng is None else rng
+        self.state_dtype = state_dtype
+        self.prioritized = prioritized
+        self.alpha = alpha
+        self.size = 0
+        self.position = 0  # where the next transition goes
+        self.states = None
+        self.actions = None
+        self.rewards = None
+        self.next_states = None
+        self.game_overs = None
+        self.priorities = None
+        self.max_priority = 1.0
+
+    def __len__(self):
+        return self.size
+
+    def _allocate(self, state_size):
+        shape = (self.capacity, state_size)
+        self.states = numpy.zeros(shape, dtype=self.state_dtype)
+        self.next_states = numpy.zeros(shape, dtype=self.state_dtype)
+        self.actions = numpy.zeros(self.capacity, dtype=numpy.int64)
+        self.rewards = numpy.zeros(self.capacity, dtype=float)
+        self.game_overs = numpy.zeros(self.capacity, dtype=bool)
+        self.priorities = numpy.zeros(self.capacity, dtype=float)
+
+    def add(self, state, action, reward, next_state, game_over):
+        if self.states is None:
+            self._allocate(numpy.size(state))
+        i = self.position
+        self.states[i] = numpy.ravel(state)
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = numpy.ravel(next_state)
+        self.game_overs[i] = game_over
+        self.priorities[i] = self.max_priority
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def sample_indices(self, sample_size):
+        sample_size = min(self.size, sample_size)
+        if not self.prioritized:
+            return self.rng.choice(self.size, sample_size, replace=False)
+        weights = self.priorities[:self.size] ** self.alpha
+        return self.rng.choice(self.size, sample_size, replace=False,
+                               p=weights / weights.sum())
+
+    def update_priorities(self, indices, errors, epsilon=1e-6):
+        priorities = numpy.abs(errors) + epsilon
+        self.priorities[indices] = priorities
+        self.max_priority = max(self.max_priority, priorities.max())
+
+
 class ArtificialIntelligence(abc.ABC):
-    def __init__(self, model, max_memory=50, discount=1.0):
-        # TODO: change discount factor?
+    def __init__(self, model, max_memory=50, discount=1.0, prioritized=False,
+                 target_model=None, rng=None):
         self.model = model
+        self.target_model = target_model  # Q(s', a') comes from here if set
         self.max_memory = max_memory
         self.discount = discount
-        self.memory = list()
+        self.memory = ReplayMemory(max_memory, prioritized=prioritized,
+                                   rng=rng)
         self.num_actions = model.output_shape[-1]
+        # predictions of the model by observation, valid until it changes
+        self.predictions = {}
+        self.max_predictions = 1024
 
     def memorize(self, episode):
-        self.memory.append(episode)
-        if len(self.memory) > self.max_memory:
-            del self.memory[0]
+        self.memory.add(*episode)
+
+    @staticmethod
+    def _key(environment_state):
+        # observations fit in int8, so int and float copies share a key
+        return numpy.asarray(environment_state, dtype=numpy.int8).tobytes()
+
+    def forget_predictions(self):
+        """call whenever the weights of the model change"""
+        self.predictions.clear()
 
     def predict(self, environment_state):
-        return self.model.predict(environment_state)[0]
+        key = self._key(environment_state)
+        prediction = self.predictions.get(key)
+        if prediction is None:
+            prediction = self.model.predict(environment_state)[0]
+            self._remember(key, prediction)
+        return prediction
+
+    def predict_batch(self, environment_states):
+        """predict every row, running the model only on unseen rows"""
+        keys = [self._key(row) for row in environment_states]
+        missing = [i for i, key in enumerate(keys) if
+                   key not in self.predictions]
+        if missing:
+            predictions = self.model.predict(environment_states[missing])
+            for i, prediction in zip(missing, predictions):
+                self._remember(keys[i], prediction)
+        return numpy.array([self.predictions[key] for key in keys])
+
+    def _remember(self, key, prediction):
+        if len(self.predictions) >= self.max_predictions:
+            self.predictions.clear()
+        self.predictions[key] = prediction
 
     def get_data(self, data_size=10):
-        initial_episode = self.memory[0]
-        initial_envstate = initial_episode[0]
-        env_size = initial_envstate.shape[1]
-        mem_size = len(self.memory)
-        data_size = min(mem_size, data_size)
-        inputs = numpy.zeros((data_size, env_size))
-        targets = numpy.zeros((data_size, self.num_actions))
-        for i, j in enumerate(
-                numpy.random.choice(range(mem_size), data_size, replace=False)):
-            envstate, action, reward, envstate_next, game_over = self.memory[j]
-            inputs[i] = envstate
-            targets[i] = self.predict(envstate)
-            # Q_sa = derived policy = max quality env/action = max_a' Q(s', a')
-            q_sa = numpy.max(self.predict(envstate_next))
-            if game_over:
-                targets[i, action] = reward
-            else:
-                # reward + gamma * max_a' Q(s', a')
-                targets[i, action] = reward + self.discount * q_sa
+        memory = self.memory
+        indices = memory.sample_indices(data_size)
+        data_size = len(indices)
+        inputs = memory.states[indices].astype(float)
+        envstates_next = memory.next_states[indices]
+        actions = memory.actions[indices]
+        rewards = memory.rewards[indices]
+        if self.target_model is None:
+            # one predict for both the current and the next states
+            predictions = self.predict_batch(
+                numpy.concatenate([inputs, envstates_next]))
+            targets = predictions[:data_size].astype(float)
+            predictions_next = predictions[data_size:]
+        else:
+            targets = self.predict_batch(inputs).astype(float)
+            predictions_next = self.target_model.predict(envstates_next)
+        # Q_sa = derived policy = max quality env/action = max_a' Q(s', a')
+        q_sa = numpy.max(predictions_next, axis=1)
+        # reward + gamma * max_a' Q(s', a'), or just the reward at the end
+        rows = numpy.arange(data_size)
+        updated = numpy.where(memory.game_overs[indices], rewards,
+                              rewards + self.discount * q_sa)
+        if memory.prioritized:
+            memory.update_priorities(indices, updated - targets[rows, actions])
+        targets[rows, actions] = updated
         return inputs, targets
 
 
+class VectorizedDoDEnv(object):
+    """a batch of DoDGameRL games stepped in lockstep
+
+    agents[i] plays opponents[i], and all agents share the model of the
+    first one. Every step runs one predict over the observations of the
+    whole batch and hands each agent its row as q_values, so no agent
+    predicts on its own.
+    """
+
+    def __init__(self, agents, opponents):
+        self.agents = agents
+        self.opponents = opponents
+        self.model = agents[0].model
+        self.batch_size = len(agents)
+        self.games = [None] * self.batch_size
+        self.by_reds = [None] * self.batch_size
+        self.buffer = numpy.zeros((self.batch_size, ObservationEncoder.SIZE),
+                                  dtype=numpy.int64)
+
+    def reset(self):
+        for i, (agent, opponent) in enumerate(zip(self.agents,
+                                                  self.opponents)):
+            for player in [agent, opponent]:
+                player.reset()
+            agent.total_reward = 0
+            if agent.intelligence is None:
+                agent.reset_rl_data()
+            if agent.epsilon is None:  # not set by train
+                agent.epsilon = agent.initial_epsilon
+            player_red, player_black = RandomPlayerOrder(agent, opponent,
+                                                         agent.rng).players
+            game = DoDGameRL(player_red, player_black, agent.rng)
+            game.distribute_piles()
+            game.build_decks()
+            self.games[i] = game
+            self.by_reds[i] = agent == game.player_red
+        return self.observe()
+
+    def observe(self):
+        """the (B, 352) observations, overwritten by the next call"""
+        return DoDGameRL.encoder.encode_batch(self.games, self.by_reds,
+                                              out=self.buffer)
+
+    def is_over(self):
+        return all(game.is_over() for game in self.games)
+
+    def step(self):
+        """advance every unfinished game by one input
+
+        Returns the indices of the games that moved along with their
+        observations, choices, rewards, next observations and game-over
+        flags, ready for ReplayMemory.add.
+        """
+        observations = self.observe().copy()
+        q_values = self.model.predict(observations)
+        indices = []
+        choices = []
+        rewards = []
+        for i, (game, agent) in enumerate(zip(self.games, self.agents)):
+            duel = game.duel_ongoing
+            while not game.is_over() and (duel is None or duel.is_over()):
+                duel = game.to_next_duel()
+            if game.is_over():
+                continue
+            game.prepare()
+            reward_before = agent.total_reward
+            agent.q_values = q_values[i]
+            user_input = game.accept(observations[i:i + 1])
+            agent.q_values = None
+            game.process(user_input)
+            indices.append(i)
+            choices.append(agent.choice_index(user_input))
+            rewards.append(agent.total_reward - reward_before)
+        next_observations = self.observe()
+        game_overs = [self.games[i].is_over() for i in indices]
+        return (indices, observations[indices], numpy.array(choices),
+                numpy.array(rewards), next_observations[indices].copy(),
+                numpy.array(game_overs, dtype=bool))
+
+    def play(self, memory=None):
+        """play every game to the end, optionally filling a ReplayMemory"""
+        self.reset()
+        n_steps = 0
+        while not self.is_over():
+            indices, observations, choices, rewards, next_observations, \
+                game_overs = self.step()
+            n_steps += len(indices)
+            if memory is not None:
+                for transition in zip(observations, choices, rewards,
+                                      next_observations, game_overs):
+                    memory.add(*transition)
+        return n_steps
+
+
 class DoDGameRL(Game):
-    def __init__(self, player_red, player_black):
-        super().__init__(player_red, player_black)
+    encoder = ObservationEncoder()  # shared, so it stays out of to_json
+
+    def __init__(self, player_red, player_black, rng=None, learners=None,
+                 **kwargs):
+        """learners are the players whose wrong choices abort the game,
+        every ReinforcementLearningAgent by default"""
+        super().__init__(player_red, player_black, rng=rng, **kwargs)
+        if learners is None:
+            learners = tuple(player for player in (player_red, player_black) if
+                             isinstance(player, ReinforcementLearningAgent))
+        self.learners = learners
+
+    @classmethod
+    def replay_options(cls, metadata, player_red, player_black):
+        # replays stand plain players in for the agents
+        agent_names = set()
+        agent_classes = [ReinforcementLearningAgent]
+        while agent_classes:
+            agent_class = agent_classes.pop()
+            agent_names.add(agent_class.__name__)
+            agent_classes.extend(agent_class.__subclasses__())
+        learners = tuple(player for key, player in (('red', player_red),
+                                                    ('black', player_black))
+                         if metadata[key]['class'] in agent_names)
+        return {'learners': learners}
+
+    def is_learner(self, player):
+        return any(player is learner for learner in self.learners)
 
     def _end(self, result, winner=None, loser=None):
         super()._end(result, winner, loser)
@@ -378,7 +787,8 @@ class DoDGameRL(Game):
             self.loser.total_reward -= 1
 
     def observe(self, by_red):
-        return self.to_array(by_red=by_red)
+        # the caller keeps the previous observation, so hand out a copy
+        return self.encoder.encode(self, by_red).copy()
 
     def process(self, intra_duel_input):
         if isinstance(intra_duel_input, OffenseDeckIndexInput):
@@ -428,7 +838,7 @@ class DoDGameRL(Game):
                 break
         for player in self.players:
             if player.recent_action not in player.valid_actions(round_):
-                if isinstance(player, ReinforcementLearningAgent):
+                if self.is_learner(player):
                     duel.end(constants.DuelState.ABORTED_BY_WRONG_CHOICE)
                     self._end(constants.GameResult.ABORTED_BY_WRONG_CHOICE,
                               loser=player)
@@ -520,7 +930,7 @@ class DoDGameRL(Game):
             if not offense_deck.is_undisclosed():
                 raise AssertionError('Choose an undisclosed deck.')
         except (IndexError, AssertionError) as e:
-            if isinstance(offense, ReinforcementLearningAgent):
+            if self.is_learner(offense):
                 duel.end(constants.DuelState.ABORTED_BY_WRONG_CHOICE)
                 self._end(constants.GameResult.ABORTED_BY_WRONG_CHOICE,
                           loser=offense)
@@ -549,7 +959,7 @@ class DoDGameRL(Game):
             if not defense_deck.is_undisclosed():
                 raise AssertionError('Choose an undisclosed deck.')
         except (IndexError, AssertionError) as e:
-            if isinstance(offense, ReinforcementLearningAgent):
+            if self.is_learner(offense):
                 duel.end(constants.DuelState.ABORTED_BY_WRONG_CHOICE)
                 self._end(constants.GameResult.ABORTED_BY_WRONG_CHOICE,
                           loser=offense)
@@ -0,0 +1,153 @@
+import argparse
+import constants
+import datetime
+import die_or_dare
+import json
+import multiprocessing
+import numpy
+import queue
+import random
+import time
+
+
+def _act(actor_index, weights_queue, experience_queue, stop_event,
+         opponent_class, epsilon, seed):
+    """play games with the latest weights until the learner says stop
+
+    Actors only run inference, so they use a NumpyMLP and never load Keras.
+    """
+    import rl
+    rng = random.Random(seed)  # the games of this actor follow its seed alone
+    model = rl.NumpyMLP(weights_queue.get())
+    agent = rl.ReinforcementLearningAgent(initial_epsilon=epsilon, model=model,
+                                          rng=rng)
+    agent.reset_rl_data()
+    agent.epsilon = epsilon
+    opponent = opponent_class(rng=rng)
+    while not stop_event.is_set():
+        weights = None
+        while True:  # skip to the most recent weights
+            try:
+                weights = weights_queue.get_nowait()
+            except queue.Empty:
+                break
+        if weights is not None:
+            agent.model.set_weights(weights)
+            agent.intelligence.forget_predictions()
+        game_start = time.time()
+        episodes, game = agent.collect_experience(opponent)
+        for episode in episodes:  # observations fit in int8
+            episode[0] = episode[0].astype(numpy.int8)
+            episode[3] = episode[3].astype(numpy.int8)
+        color = 1 if agent.alias == constants.PLAYER_RED else 2
+        summary = (int(game.winner == agent), game.result.value,
+                   game.duel_index + 1, time.time() - game_start, color)
+        experience_queue.put((actor_index, episodes, summary))
+
+
+def _broadcast(weights, weights_queues):
+    """replace whatever weights the actors have not picked up yet"""
+    for weights_queue in weights_queues:
+        try:
+            weights_queue.get_nowait()
+        except queue.Empty:
+            pass
+        weights_queue.put(weights)
+
+
+def learn(agent, opponent_class=die_or_dare.AntiDie, n_games=1000,
+          n_actors=None, epsilon=0.1, data_size=50, epochs=1, batch_size=32,
+          max_memory=100000, sync_every=10, discount=1.0,
+          target_sync_every=None, seed=0, results_store=None,
+          weights_file_name='new.h5', architecture_file_name='new.json'):
+    """train agent on games played by n_actors worker processes
+
+    Each actor plays DoDGameRL games against opponent_class() with its own
+    copy of the model and sends the episodes of every finished game through
+    a queue. The learner keeps fitting on its replay memory while it drains
+    the queue, and sends its weights to the actors every sync_every fits.
+    discount and target_sync_every are as in ReinforcementLearningAgent.train.
+    """
+    if n_actors is None:
+        n_actors = max(1, multiprocessing.cpu_count() - 1)
+    train_start = datetime.datetime.now()
+    # TensorFlow does not survive a fork, so the actors start from scratch
+    context = multiprocessing.get_context('spawn')
+    experience_queue = context.Queue()
+    weights_queues = [context.Queue(maxsize=1) for _ in range(n_actors)]
+    stop_event = context.Event()
+    _broadcast(agent.model.get_weights(), weights_queues)
+    actors = []
+    for actor_index in range(n_actors):
+        args = (actor_index, weights_queues[actor_index], experience_queue,
+                stop_event, opponent_class, epsilon, seed + actor_index)
+        actor = context.Process(target=_act, args=args)
+        actor.start()
+        actors.append(actor)
+    if target_sync_every is not None:
+        agent.sync_target_model()
+    agent.numpy_rng = numpy.random.RandomState(seed)
+    agent.reset_rl_data(max_memory, discount=discount)
+    intelligence = agent.intelligence
+    n_played = 0
+    n_fits = 0
+    loss = 0.0
+    try:
+        while n_played < n_games:
+            # wait for experience only while there is nothing to learn from
+            block = len(intelligence.memory) == 0
+            try:
+                while n_played < n_games:
+                    _, episodes, summary = experience_queue.get(block=block)
+                    block = False
+                    for episode in episodes:
+                        intelligence.memorize(episode)
+                    n_played += 1
+                    columns = (n_played, loss, len(episodes)) + summary
+                    print(','.join(str(elem) for elem in columns))
+                    if results_store is not None:
+                        results_store.append(columns)
+            except queue.Empty:
+                pass
+            n_fits += 1
+            loss = agent.fit(data_size, epochs, batch_size, True, loss,
+                             agent._every(n_fits, target_sync_every))
+            if n_fits % sync_every == 0:
+                _broadcast(agent.model.get_weights(), weights_queues)
+    finally:
+        stop_event.set()
+        for actor in actors:
+            # let an actor blocked on a full pipe finish its last put
+            while actor.is_alive():
+                try:
+                    experience_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            actor.join()
+    if results_store is not None:
+        results_store.flush()
+    training_time = (datetime.datetime.now() - train_start).total_seconds()
+    print('{} games in {:.2f} seconds'.format(n_played, training_time))
+    agent.model.save_weights(weights_file_name)
+    with open(architecture_file_name, 'w') as outfile:
+        json.dump(agent.model.to_json(), outfile)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Train the RL agent on games played in worker processes.')
+    parser.add_argument('-n', '--games', type=int, default=1000,
+                        help='number of games to learn from')
+    parser.add_argument('-a', '--actors', type=int, default=None,
+                        help='number of actor processes (default: cores - 1)')
+    parser.add_argument('-e', '--epsilon', type=float, default=0.1,
+                        help='exploration rate of the actors')
+    parser.add_argument('--sync-every', type=int, default=10,
+                        help='number of fits between weight updates')
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    arguments = parser.parse_args()
+    import rl
+    learn(rl.ReinforcementLearningAgent(), n_games=arguments.games,
+          n_actors=arguments.actors, epsilon=arguments.epsilon,
+          sync_every=arguments.sync_every, seed=arguments.seed)
+    print('Done!')
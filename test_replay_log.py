@@ -0,0 +1,49 @@
+import constants
+import die_or_dare
+import numpy
+import random
+import rl
+
+
+def record_rl_game(seed):
+    """play a DoDGameRL game of an untrained agent and log it like train"""
+    rng = random.Random(seed)
+    weights = numpy.random.RandomState(seed).randn(
+        die_or_dare.ObservationEncoder.SIZE,
+        len(rl.ReinforcementLearningAgent.choices))
+    model = rl.NumpyMLP([weights, numpy.zeros(weights.shape[1])])
+    agent = rl.ReinforcementLearningAgent(model=model, rng=rng)
+    agent.reset_rl_data()
+    agent.epsilon = 0.5
+    opponent = die_or_dare.ComputerPlayer(rng=rng)
+    player_red, player_black = die_or_dare.RandomPlayerOrder(
+        agent, opponent, rng).players
+    game = rl.DoDGameRL(player_red, player_black, rng)
+    game.distribute_piles()
+    game.build_decks()
+    log = die_or_dare.ReplayLog.start(game)
+    by_red = agent == game.player_red
+    envstate = game.observe(by_red)
+    while not game.is_over():
+        duel = game.to_next_duel()
+        while not duel.is_over():
+            game.prepare()
+            user_input = game.accept(envstate)
+            game.process(user_input)
+            log.record(user_input, game)
+            envstate = game.observe(by_red)
+    return game, die_or_dare.ReplayLog.decode(log.encode())
+
+
+def test_replay_dod_game_rl_logs():
+    results = set()
+    for seed in range(40):
+        game, log = record_rl_game(seed)
+        results.add(game.result)
+        assert log.game_class() is rl.DoDGameRL
+        games = [replayed.to_bytes() for replayed in log.replay()]
+        assert len(games) == len(log)
+        assert games[-1] == game.to_bytes()
+        assert log.state_at(len(log.events)).to_bytes() == game.to_bytes()
+    # the rules of DoDGameRL were followed
+    assert constants.GameResult.ABORTED_BY_WRONG_CHOICE in results
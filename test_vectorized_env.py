@@ -0,0 +1,25 @@
+import die_or_dare
+import numpy
+import random
+import rl
+
+
+def test_play_from_fresh_agents():
+    weights = numpy.random.RandomState(0).randn(
+        die_or_dare.ObservationEncoder.SIZE,
+        len(rl.ReinforcementLearningAgent.choices))
+    model = rl.NumpyMLP([weights, numpy.zeros(weights.shape[1])])
+    agents = []
+    opponents = []
+    for seed in range(4):
+        rng = random.Random(seed)
+        agents.append(rl.ReinforcementLearningAgent(
+            initial_epsilon=0.2, model=model, rng=rng))
+        opponents.append(die_or_dare.AntiDie(rng=rng))
+    env = rl.VectorizedDoDEnv(agents, opponents)
+    memory = rl.ReplayMemory(1000)
+    n_steps = env.play(memory)
+    assert n_steps > 0
+    assert len(memory) == n_steps
+    assert env.is_over()
+    assert all(agent.epsilon == 0.2 for agent in agents)
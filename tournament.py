@@ -0,0 +1,163 @@
+import argparse
+import collections
+import die_or_dare
+import functools
+import itertools
+import multiprocessing
+import numpy
+
+Contestant = collections.namedtuple('Contestant', (
+    'player_class', 'joker_value_strategy', 'joker_position_strategy',
+    'offense_deck_index_strategy', 'defense_deck_index_strategy'))
+
+PRESETS = (
+    Contestant(die_or_dare.DieBlindButSmart, None, None, None, None),
+    Contestant(die_or_dare.AntiDie, None, None, None, None),
+)
+JOKER_VALUE_STRATEGIES = (die_or_dare.Thirteen, die_or_dare.SameAsMax,
+                          die_or_dare.RandomNumber, die_or_dare.NextBiggest)
+JOKER_POSITION_STRATEGIES = (die_or_dare.JokerFirst, die_or_dare.JokerLast,
+                             die_or_dare.JokerAnywhere,
+                             die_or_dare.JokerNotFirst)
+OFFENSE_DECK_INDEX_STRATEGIES = (die_or_dare.BiggestOffenseDeck,
+                                 die_or_dare.AnyOffenseDeck)
+DEFENSE_DECK_INDEX_STRATEGIES = (die_or_dare.SmallestDefenseDeck,
+                                 die_or_dare.AnyDefenseDeck,
+                                 die_or_dare.StatsConsideredBiggest)
+
+
+def describe(contestant):
+    """name a contestant by its class and the strategies it overrides"""
+    names = [contestant.player_class.__name__]
+    names.extend(strategy.__name__ for strategy in contestant[1:] if
+                 strategy is not None)
+    return '/'.join(names)
+
+
+def build_player(contestant):
+    player = contestant.player_class()
+    if contestant.joker_value_strategy is not None:
+        player.joker_value_strategy = contestant.joker_value_strategy
+    if contestant.joker_position_strategy is not None:
+        player.joker_position_strategy = contestant.joker_position_strategy
+    if contestant.offense_deck_index_strategy is not None:
+        player.offense_deck_index_strategy = \
+            contestant.offense_deck_index_strategy
+    if contestant.defense_deck_index_strategy is not None:
+        player.defense_deck_index_strategy = \
+            contestant.defense_deck_index_strategy
+    return player
+
+
+def enumerate_contestants(
+        player_classes=(die_or_dare.ComputerPlayer,),
+        joker_value_strategies=JOKER_VALUE_STRATEGIES,
+        joker_position_strategies=JOKER_POSITION_STRATEGIES,
+        offense_deck_index_strategies=OFFENSE_DECK_INDEX_STRATEGIES,
+        defense_deck_index_strategies=DEFENSE_DECK_INDEX_STRATEGIES,
+        presets=PRESETS):
+    """the presets followed by the cross product of the given strategies"""
+    combinations = itertools.product(player_classes, joker_value_strategies,
+                                     joker_position_strategies,
+                                     offense_deck_index_strategies,
+                                     defense_deck_index_strategies)
+    return list(presets) + [Contestant(*combination) for combination in
+                            combinations]
+
+
+def _play_shard(shard):
+    """play one shard of a pairing in a worker process"""
+    index_red, index_black, contestant_red, contestant_black, n_games, seed = \
+        shard
+    red_factory = functools.partial(build_player, contestant_red)
+    black_factory = functools.partial(build_player, contestant_black)
+    records = die_or_dare.simulate(n_games, red_factory, black_factory, seed)
+    num_red_won = sum(record.red_won for record in records)
+    return index_red, index_black, num_red_won, len(records)
+
+
+class TournamentResult(object):
+    def __init__(self, contestants, wins, games):
+        self.contestants = contestants
+        self.wins = wins  # wins[i, j]: games i won against j
+        self.games = games  # games[i, j]: games played between i and j
+
+    def win_rate(self):
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            return self.wins / self.games
+
+    def confidence_interval(self, z=1.96):
+        """Wilson score interval of every entry of the win-rate matrix"""
+        n = self.games
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            p = self.wins / n
+            denominator = 1 + z ** 2 / n
+            center = (p + z ** 2 / (2 * n)) / denominator
+            margin = z * numpy.sqrt(
+                p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denominator
+        return center - margin, center + margin
+
+    def to_csv(self, file_path):
+        win_rate = self.win_rate()
+        lower, upper = self.confidence_interval()
+        with open(file_path, 'w') as output:
+            column_names = ('contestant', 'opponent', 'games', 'wins',
+                            'win_rate', 'lower', 'upper')
+            output.write(','.join(column_names) + '\n')
+            num_contestants = len(self.contestants)
+            for i, j in itertools.permutations(range(num_contestants), 2):
+                row = (describe(self.contestants[i]),
+                       describe(self.contestants[j]), int(self.games[i, j]),
+                       int(self.wins[i, j]), round(win_rate[i, j], 4),
+                       round(lower[i, j], 4), round(upper[i, j], 4))
+                output.write(','.join(str(element) for element in row) + '\n')
+
+
+def run(contestants, games_per_pairing=100, shard_size=50, processes=None,
+        seed=0):
+    """play a round robin between all contestants across a process pool
+
+    Every pairing plays half of its games with each contestant as the Player
+    Red. Games are cut into shards of at most shard_size games, and each
+    shard is seeded with seed plus its position so that reruns match.
+    """
+    shards = []
+    for i, j in itertools.combinations(range(len(contestants)), 2):
+        for index_red, index_black, n_games in (
+                (i, j, games_per_pairing - games_per_pairing // 2),
+                (j, i, games_per_pairing // 2)):
+            for start in range(0, n_games, shard_size):
+                shard_games = min(shard_size, n_games - start)
+                shard = (index_red, index_black, contestants[index_red],
+                         contestants[index_black], shard_games,
+                         seed + len(shards))
+                shards.append(shard)
+    num_contestants = len(contestants)
+    wins = numpy.zeros((num_contestants, num_contestants))
+    games = numpy.zeros((num_contestants, num_contestants))
+    with multiprocessing.Pool(processes) as pool:
+        for index_red, index_black, num_red_won, n_games in \
+                pool.imap_unordered(_play_shard, shards):
+            wins[index_red, index_black] += num_red_won
+            wins[index_black, index_red] += n_games - num_red_won
+            games[index_red, index_black] += n_games
+            games[index_black, index_red] += n_games
+    return TournamentResult(contestants, wins, games)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Play a round robin between computer strategies.')
+    parser.add_argument('-n', '--games', type=int, default=100,
+                        help='number of games per pairing')
+    parser.add_argument('--shard-size', type=int, default=50,
+                        help='number of games per task sent to a worker')
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help='number of worker processes (default: all cores)')
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', default='tournament.csv')
+    arguments = parser.parse_args()
+    result = run(enumerate_contestants(), arguments.games,
+                 arguments.shard_size, arguments.processes, arguments.seed)
+    result.to_csv(arguments.output)
+    print('Done!')
@@ -1,3 +1,4 @@
+import columnar
 import constants
 import itertools
 import matplotlib.pyplot as plt
@@ -7,10 +8,15 @@ import os
 
 
 class Plotter(object):
-    def __init__(self, path_to_csv_file):
-        data = np.genfromtxt(path_to_csv_file, delimiter=',', dtype=[
-            ('epoch', 'i'), ('loss', 'f'), ('episode', 'i'), ('result', 'i'),
-            ('reason', 'i'), ('duel', 'i'), ('time', 'f'), ('color', 'i')], )
+    def __init__(self, path):
+        """read training results from a CSV file or a columnar store"""
+        if os.path.isdir(path):
+            data = columnar.ColumnarStore(path).load()
+        else:
+            data = np.genfromtxt(path, delimiter=',', dtype=[
+                ('epoch', 'i'), ('loss', 'f'), ('episode', 'i'),
+                ('result', 'i'), ('reason', 'i'), ('duel', 'i'), ('time', 'f'),
+                ('color', 'i')], )
         self.epoch = data['epoch']
         self.loss = data['loss']
         self.episode = data['episode']